@@ -1,10 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import and_, or_, insert, update, delete, func
 import models
 import schemas
 import security
-import json
-from models import Itinerary
+import orjson
+import base64
+import secrets
+from datetime import datetime, timedelta
+from models import Itinerary, ItineraryJob
 
 async def get_user_by_email(db: AsyncSession, email: str):
     """
@@ -21,7 +25,7 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
     This involves hashing the password and saving the new user model.
     """
     # Get the hashed password from our security helper
-    hashed_password = security.get_password_hash(user.password)
+    hashed_password = await security.get_password_hash_async(user.password)
     
     # Create a new User *model* (the database version of a user)
     # Note: We are NOT saving the plain text password.
@@ -38,23 +42,231 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
     
     # Refresh the object to get the new ID from the database
     await db.refresh(db_user)
+
+    # Any token cached for this email belonged to an older row
+    security.invalidate_user(db_user.email)
     
     return db_user
 
+def encode_plan(plan: list) -> str:
+    """
+    A plan as stored in plan_json: always strict JSON, so it can be served as is.
+    Raises orjson.JSONEncodeError for values JSON can't hold (e.g. ints over 64 bits).
+    """
+    return orjson.dumps(plan).decode()
+
 async def save_itinerary(db, user_id: int, destination: str, days: int, plan: list):
     new_itinerary = Itinerary(
         user_id=user_id,
         destination=destination,
         days=days,
-        plan_json=json.dumps(plan)
+        plan_json=encode_plan(plan)
     )
     db.add(new_itinerary)
     await db.commit()
     await db.refresh(new_itinerary)
     return new_itinerary
 
-async def get_user_itineraries(db, user_id: int):
+async def save_itineraries_bulk(db, user_id: int, items: list, batch_size: int = 100) -> list[int]:
+    """
+    Inserts many itineraries in one transaction. `items` are
+    (ItinerarySaveRequest, plan_json) pairs, the plan already encoded with encode_plan.
+    Each batch is an INSERT ... RETURNING id, so no per-row refresh is needed:
+    one multi-row statement on Postgres, one per row on SQLite (in-process, about as fast).
+    Returns the new ids in the same order as `items`.
+    """
+    ids = []
+    created_at = datetime.utcnow()
+    for start in range(0, len(items), batch_size):
+        rows = [
+            {
+                "user_id": user_id,
+                "destination": item.destination,
+                "days": item.days,
+                "plan_json": plan_json,
+                "created_at": created_at,
+            }
+            for item, plan_json in items[start:start + batch_size]
+        ]
+        # RETURNING order isn't guaranteed for a multi-row VALUES (Postgres says so);
+        # sort_by_parameter_order has SQLAlchemy line the ids up with `rows`
+        result = await db.execute(
+            insert(Itinerary).returning(Itinerary.id, sort_by_parameter_order=True), rows
+        )
+        ids.extend(result.scalars().all())
+    await db.commit()
+    return ids
+
+
+def encode_cursor(created_at: datetime, itinerary_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{itinerary_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Raises ValueError if the cursor was not made by encode_cursor.
+    """
+    try:
+        created_at, itinerary_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(itinerary_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def get_user_itineraries(db, user_id: int, limit: int = 20, cursor: str | None = None):
+    """
+    One page of a user's itineraries, newest first, without plan_json.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = (
+        select(Itinerary.id, Itinerary.destination, Itinerary.days, Itinerary.created_at)
+        .where(Itinerary.user_id == user_id)
+        .order_by(Itinerary.created_at.desc(), Itinerary.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, itinerary_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Itinerary.created_at < created_at,
+            and_(Itinerary.created_at == created_at, Itinerary.id < itinerary_id)
+        ))
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+async def get_itinerary(db, user_id: int, itinerary_id: int):
+    """
+    Fetches one full itinerary, only if it belongs to this user.
+    """
     result = await db.execute(
-        select(Itinerary).where(Itinerary.user_id == user_id)
+        select(Itinerary).where(Itinerary.id == itinerary_id, Itinerary.user_id == user_id)
     )
-    return result.scalars().all()
\ No newline at end of file
+    return result.scalars().first()
+
+
+async def get_geocode(db: AsyncSession, query: str):
+    """
+    Looks up a cached geocode row by its normalized query.
+    Returns the GeocodeCache model if found, None otherwise.
+    """
+    return await db.get(models.GeocodeCache, query)
+
+
+async def save_geocode(db: AsyncSession, query: str, lat: float, lng: float):
+    """
+    Inserts or refreshes a cached geocode row.
+    """
+    await db.merge(models.GeocodeCache(
+        query=query,
+        lat=lat,
+        lng=lng,
+        updated_at=datetime.utcnow()
+    ))
+    await db.commit()
+
+
+# --- Itinerary jobs (the queue behind jobs.py) ---
+
+async def count_jobs(db: AsyncSession, user_id: int) -> tuple[int, int]:
+    """
+    Returns (jobs queued in total, jobs queued or running for this user).
+    """
+    queued = await db.scalar(select(func.count()).where(ItineraryJob.status == "queued"))
+    active = await db.scalar(
+        select(func.count()).where(ItineraryJob.user_id == user_id, ItineraryJob.status.in_(("queued", "running")))
+    )
+    return queued, active
+
+
+async def create_job(db: AsyncSession, user_id: int, request_json: str):
+    job = ItineraryJob(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        status="queued",
+        request_json=request_json,
+        created_at=datetime.utcnow()
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_job(db: AsyncSession, user_id: int, job_id: str):
+    """
+    Fetches one job, only if it belongs to this user.
+    """
+    result = await db.execute(
+        select(ItineraryJob)
+        .where(ItineraryJob.id == job_id, ItineraryJob.user_id == user_id)
+        .execution_options(populate_existing=True)  # long polls re-read the same row
+    )
+    return result.scalars().first()
+
+
+async def claim_job(db: AsyncSession, lease_seconds: float):
+    """
+    Marks the oldest claimable job as running and returns it, or None.
+    Claimable means queued, or running with a lease older than lease_seconds
+    (its worker died). The conditional UPDATE makes the claim safe when
+    several workers or processes race for the same row.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=lease_seconds)
+    claimable = or_(
+        ItineraryJob.status == "queued",
+        and_(ItineraryJob.status == "running", ItineraryJob.started_at < stale)
+    )
+    for _ in range(3):
+        job_id = await db.scalar(
+            select(ItineraryJob.id).where(claimable).order_by(ItineraryJob.created_at).limit(1)
+        )
+        if job_id is None:
+            return None
+        result = await db.execute(
+            update(ItineraryJob)
+            .where(ItineraryJob.id == job_id, claimable)
+            .values(status="running", started_at=now, attempts=ItineraryJob.attempts + 1)
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            return await db.get(ItineraryJob, job_id, populate_existing=True)
+        # another worker got it first; try the next one
+    return None
+
+
+async def finish_job(db: AsyncSession, job_id: str, result_json: str | None = None, error: str | None = None):
+    await db.execute(
+        update(ItineraryJob)
+        .where(ItineraryJob.id == job_id)
+        .values(
+            status="failed" if error is not None else "done",
+            result_json=result_json,
+            error=error,
+            finished_at=datetime.utcnow()
+        )
+    )
+    await db.commit()
+
+
+async def requeue_job(db: AsyncSession, job_id: str):
+    """
+    Puts a running job back in the queue (e.g. its worker is shutting down).
+    """
+    await db.execute(
+        update(ItineraryJob)
+        .where(ItineraryJob.id == job_id, ItineraryJob.status == "running")
+        .values(status="queued", started_at=None, attempts=ItineraryJob.attempts - 1)
+    )
+    await db.commit()
+
+
+async def delete_jobs_before(db: AsyncSession, created_before: datetime) -> int:
+    result = await db.execute(delete(ItineraryJob).where(ItineraryJob.created_at < created_before))
+    await db.commit()
+    return result.rowcount
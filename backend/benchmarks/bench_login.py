@@ -0,0 +1,120 @@
+"""
+Login throughput benchmark.
+
+Drives POST /api/auth/login in-process (httpx ASGI transport, scratch SQLite
+database) at several concurrency levels. It reports logins per second,
+p50/p95/p99 latency and how many logins were turned away with 503.
+Meanwhile a probe keeps calling /api/health, which shows whether bcrypt
+work is still stalling the event loop for other traffic.
+
+Run from the backend folder:
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --concurrency 1,4,16,64 --logins 200 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ["DEMO_ACCOUNT_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import migrations  # noqa: E402
+import security  # noqa: E402
+
+USERS = 20
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, logins: int) -> dict:
+    latencies, probes = [], []
+    rejected = failed = 0
+    remaining = logins
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/api/health")
+            probes.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    async def worker(worker_id: int):
+        nonlocal remaining, rejected, failed
+        while remaining > 0:
+            remaining -= 1
+            body = {"email": f"user{(worker_id + remaining) % USERS}@example.com", "password": PASSWORD}
+            start = time.perf_counter()
+            response = await client.post("/api/auth/login", json=body)
+            if response.status_code == 503:
+                # turned away by admission control: back off and retry
+                rejected += 1
+                remaining += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")) / 10)
+                continue
+            if response.status_code != 200:
+                failed += 1
+            latencies.append(time.perf_counter() - start)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    return {
+        "concurrency": concurrency,
+        "logins": len(latencies),
+        "logins_per_sec": round(len(latencies) / elapsed, 1),
+        "rejected": rejected,
+        "failed": failed,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "health_p99_ms": round(percentile(probes, 0.99) * 1000, 1) if probes else None,
+    }
+
+
+async def main_async():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--concurrency", default="1,4,16,64", help="comma-separated levels")
+    ap.add_argument("--logins", type=int, default=100, help="logins per level")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    await migrations.upgrade()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(USERS):
+            await client.post("/api/auth/register", json={"email": f"user{i}@example.com", "password": PASSWORD})
+
+        results = []
+        for level in (int(c) for c in args.concurrency.split(",")):
+            results.append(await run_level(client, level, args.logins))
+
+    report = {"hasher": security.password_hasher_stats(), "levels": results}
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    security.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
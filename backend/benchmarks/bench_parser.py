@@ -0,0 +1,164 @@
+"""
+Correctness check and micro-benchmark for itinerary_parser.
+
+Every corpus/*.txt file is a recorded (or hand-made odd) Gemini output and
+corpus/*.json holds the expected plan for it. The script fails if the parser
+output changes, then reports parsing throughput for the parser and for the
+previous regex-chain implementation kept below for comparison. Each is timed
+best-of-`--repeats`, the implementations taking turns, so a noisy machine
+slows all of them alike instead of deciding the comparison.
+
+Run from the backend folder:
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --iterations 2000 --repeats 9 --json results.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import itinerary_parser  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def legacy_parse(raw: str, days: int) -> list:
+    """
+    The parser that used to live inline in services.generate_itinerary.
+    """
+    text = raw.replace("\r\n", "\n").strip()
+    text = re.sub(r"\*{1,3}", "", text)
+    text = re.sub(r"•", "-", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+
+    day_split_regex = re.compile(r"(?:^|\n)(Day\s*\d+[:\-\)]?)", flags=re.IGNORECASE)
+    parts = day_split_regex.split(text)
+
+    plan = []
+    if len(parts) > 1:
+        i = 1
+        while i < len(parts):
+            marker = parts[i].strip()
+            body = parts[i+1].strip() if i+1 < len(parts) else ""
+            m = re.search(r"(\d+)", marker)
+            day_num = int(m.group(1)) if m else len(plan) + 1
+            body = re.sub(r"\n\s*\-\s*", " • ", body)
+            body = re.sub(r"\n", " ", body)
+            body = " ".join(body.split())
+            plan.append({"day": day_num, "summary": body, "places": []})
+            i += 2
+    else:
+        sentences = re.split(r'(?<=[.!?])\s+', text)
+        if len(sentences) <= days:
+            for idx in range(days):
+                summary = sentences[idx].strip() if idx < len(sentences) else ""
+                plan.append({"day": idx+1, "summary": summary, "places": []})
+        else:
+            chunk_size = max(1, len(sentences) // days)
+            for idx in range(days):
+                chunk = sentences[idx*chunk_size:(idx+1)*chunk_size]
+                summary = " ".join(s.strip() for s in chunk)
+                plan.append({"day": idx+1, "summary": summary, "places": []})
+
+    if len(plan) < days:
+        for fill_day in range(len(plan)+1, days+1):
+            plan.append({"day": fill_day, "summary": "", "places": []})
+    return plan
+
+
+def load_corpus() -> list:
+    cases = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8", newline="") as f:
+            raw = f.read()
+        with open(path[:-4] + ".json", encoding="utf-8") as f:
+            expected = json.load(f)
+        cases.append((os.path.basename(path), raw, expected["days"], expected["plan"]))
+    return cases
+
+
+def parse_streamed(raw: str, days: int, chunk_size: int = 16) -> list:
+    parser = itinerary_parser.DayStreamParser(days)
+    plan = []
+    for i in range(0, len(raw), chunk_size):
+        plan += parser.feed(raw[i:i + chunk_size])
+    return plan + parser.finish()
+
+
+def check(cases: list) -> list:
+    failures = []
+    for name, raw, days, expected in cases:
+        if itinerary_parser.parse_itinerary(raw, days) != expected:
+            failures.append(f"{name}: parse_itinerary output changed")
+        if parse_streamed(raw, days) != expected:
+            failures.append(f"{name}: streamed parse differs from expected")
+    return failures
+
+
+def timed(fn, cases: list, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for _, raw, days, _ in cases:
+            fn(raw, days)
+    return time.perf_counter() - start
+
+
+def bench(fns: dict, cases: list, iterations: int, repeats: int) -> dict:
+    """
+    Best time of `repeats` runs per implementation, interleaving the runs.
+    """
+    best = {name: float("inf") for name in fns}
+    for _ in range(repeats):
+        for name, fn in fns.items():
+            best[name] = min(best[name], timed(fn, cases, iterations))
+    return {name: throughput(elapsed, cases, iterations) for name, elapsed in best.items()}
+
+
+def throughput(elapsed: float, cases: list, iterations: int) -> dict:
+    total_bytes = sum(len(raw.encode()) for _, raw, _, _ in cases)
+    docs = iterations * len(cases)
+    return {
+        "docs_per_sec": round(docs / elapsed),
+        "mb_per_sec": round(total_bytes * iterations / elapsed / 1e6, 2),
+        "us_per_doc": round(elapsed / docs * 1e6, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--iterations", type=int, default=500)
+    ap.add_argument("--repeats", type=int, default=7)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    cases = load_corpus()
+    failures = check(cases)
+    for failure in failures:
+        print("FAIL", failure)
+
+    legacy_mismatches = [name for name, raw, days, expected in cases if legacy_parse(raw, days) != expected]
+    timings = bench(
+        {"parser": itinerary_parser.parse_itinerary, "parser_streamed": parse_streamed, "legacy": legacy_parse},
+        cases, args.iterations, args.repeats
+    )
+    results = {
+        "corpus_files": len(cases),
+        "failures": failures,
+        "legacy_mismatches": legacy_mismatches,
+        **timings,
+        "speedup_vs_legacy": round(timings["legacy"]["us_per_doc"] / timings["parser"]["us_per_doc"], 2),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
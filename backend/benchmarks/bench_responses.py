@@ -0,0 +1,168 @@
+"""
+Response size and serialization cost benchmark.
+
+Saves itineraries with realistic POIs into a scratch SQLite database, then
+fetches a stored plan (GET /api/itinerary/{id}) and a page of the list
+(GET /api/itinerary/my) in-process (httpx ASGI transport). For each
+Accept-Encoding it reports bytes on the wire and server CPU time per
+response, measured with time.process_time around the requests, so it
+includes routing, auth, the database read, serialization and compression
+(and the in-process client).
+
+A second section isolates the part that changed for stored plans: building
+the body the old way (plan_json as an escaped string inside stdlib JSON,
+parsed twice by the client) versus splicing the stored JSON in as is.
+
+Run from the backend folder:
+    python benchmarks/bench_responses.py
+    python benchmarks/bench_responses.py --days 10 --requests 300 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ["DEMO_ACCOUNT_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import main  # noqa: E402
+import migrations  # noqa: E402
+from responses import RawJSONResponse  # noqa: E402
+
+ENCODINGS = {"identity": "identity", "gzip": "gzip", "br": "br, gzip"}
+
+
+def fake_place(day: int, i: int) -> dict:
+    return {
+        "place_id": f"ChIJ{day:03d}{i:03d}abcdefghijklmnopqrstu",
+        "name": f"Café \"Lakeview\" #{i} – Old Town",
+        "address": f"{i} Promenade Road, Ward {day}, Udaipur, Rajasthan 313001, India",
+        "lat": 24.57 + i / 1000, "lng": 73.68 + day / 1000,
+        "rating": 4.4, "reviews": 1200 + i,
+        "types": ["restaurant", "cafe", "food", "point_of_interest", "establishment"],
+        "website": f"https://example.com/places/{day}/{i}",
+        "open_now": True,
+        "hours": [f"{d}: 8:00 AM – 11:00 PM" for d in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")],
+        "photos": [{"name": f"places/ChIJ{day:03d}{i:03d}/photos/AUc7tXabc{j}", "width": 4032, "height": 3024,
+                    "attributions": ["A Photographer"]} for j in range(3)],
+    }
+
+
+def fake_plan(days: int, per_day: int) -> list:
+    return [
+        {
+            "day": d,
+            "summary": "- Morning walk around the lake.\n- Lunch at a rooftop café.\n- Sunset boat ride.",
+            "places": [fake_place(d, i) for i in range(per_day)],
+        }
+        for d in range(1, days + 1)
+    ]
+
+
+async def measure(client: httpx.AsyncClient, url: str, headers: dict, requests: int) -> dict:
+    sizes = []
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(requests):
+        # stream so we see the bytes as sent, before httpx decompresses them
+        async with client.stream("GET", url, headers=headers) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            assert response.status_code == 200, response.status_code
+        sizes.append(len(raw))
+    return {
+        "bytes": sizes[-1],
+        "cpu_us_per_response": round((time.process_time() - cpu) / requests * 1e6, 1),
+        "wall_us_per_response": round((time.perf_counter() - wall) / requests * 1e6, 1),
+        "content_encoding": response.headers.get("content-encoding", "identity"),
+    }
+
+
+def time_per_call(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return round((time.process_time() - start) / repeat * 1e6, 1)
+
+
+def serialization(plan: list, repeat: int) -> dict:
+    stored = orjson.dumps(plan).decode()
+    meta = {"id": 1, "destination": "Udaipur", "days": len(plan), "created_at": datetime(2025, 1, 1)}
+
+    def nested_string():
+        return JSONResponse(dict(meta, created_at=meta["created_at"].isoformat(), plan_json=stored)).body
+
+    def raw_fragment():
+        return RawJSONResponse(meta, fragments={"plan": stored}).body
+
+    return {
+        "nested_string": {
+            "bytes": len(nested_string()),
+            "server_us": time_per_call(nested_string, repeat),
+            "client_parse_us": time_per_call(lambda: json.loads(json.loads(nested_string())["plan_json"]), repeat),
+        },
+        "raw_fragment": {
+            "bytes": len(raw_fragment()),
+            "server_us": time_per_call(raw_fragment, repeat),
+            "client_parse_us": time_per_call(lambda: json.loads(raw_fragment())["plan"], repeat),
+        },
+    }
+
+
+async def main_async():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--days", type=int, default=7, help="days per saved plan")
+    ap.add_argument("--places", type=int, default=3, help="POIs per day")
+    ap.add_argument("--saved", type=int, default=100, help="itineraries saved (list page size)")
+    ap.add_argument("--requests", type=int, default=200, help="requests per measurement")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    await migrations.upgrade()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        creds = {"email": "bench@example.com", "password": "benchmark-password"}
+        await client.post("/api/auth/register", json=creds)
+        token = (await client.post("/api/auth/login", json=creds)).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+
+        plan = fake_plan(args.days, args.places)
+        items = [{"destination": "Udaipur", "days": args.days, "plan": plan} for _ in range(args.saved)]
+        ids = (await client.post("/api/itinerary/bulk", json={"items": items}, headers=auth)).json()["ids"]
+
+        targets = {
+            "itinerary": f"/api/itinerary/{ids[0]}",
+            "list": f"/api/itinerary/my?limit={min(args.saved, 100)}",
+        }
+        results = {}
+        for name, url in targets.items():
+            for label, accept in ENCODINGS.items():
+                await measure(client, url, dict(auth, **{"Accept-Encoding": accept}), 5)  # warm up
+                results[f"{name}/{label}"] = await measure(
+                    client, url, dict(auth, **{"Accept-Encoding": accept}), args.requests
+                )
+
+    report = {
+        "days": args.days,
+        "places_per_day": args.places,
+        "results": results,
+        "serialization": serialization(plan, args.requests * 5),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
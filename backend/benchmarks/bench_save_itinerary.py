@@ -0,0 +1,110 @@
+"""
+Save-itinerary load test for the database profiles in database.py.
+
+Runs CRUD.save_itinerary from many concurrent workers against a fresh
+SQLite file, once with SQLite's defaults (rollback journal, synchronous=FULL)
+and once with the tuned pragmas (WAL, synchronous=NORMAL, mmap, busy_timeout),
+and reports saves per second and commit latency for each. Optional reader
+tasks list itineraries at the same time, like the real API does.
+
+Run from the backend folder:
+    python benchmarks/bench_save_itinerary.py
+    python benchmarks/bench_save_itinerary.py --concurrency 32 --saves 50 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+import CRUD  # noqa: E402
+import models  # noqa: E402
+from database import Base, SQLITE_PRAGMAS, create_engine_for  # noqa: E402
+
+PLAN = [{"day": d, "summary": "Fort walk • Lunch at a local cafe • Sunset point", "places": []} for d in range(1, 6)]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_profile(name: str, pragmas: dict | None, concurrency: int, saves: int, readers: int, workdir: str) -> dict:
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for(url, sqlite_pragmas=pragmas, echo=False, pool_size=concurrency + readers)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_factory() as db:
+            db.add(models.User(email="bench@example.com", hashed_password="x"))
+            await db.commit()
+
+        latencies = []
+        reads = 0
+        done = asyncio.Event()
+
+        async def reader():
+            nonlocal reads
+            while not done.is_set():
+                async with session_factory() as db:
+                    await CRUD.get_user_itineraries(db, user_id=1, limit=20)
+                reads += 1
+
+        async def worker():
+            for _ in range(saves):
+                async with session_factory() as db:
+                    start = time.perf_counter()
+                    await CRUD.save_itinerary(db, user_id=1, destination="Pune", days=len(PLAN), plan=PLAN)
+                    latencies.append(time.perf_counter() - start)
+
+        reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*reader_tasks)
+        await engine.dispose()
+
+    total = concurrency * saves
+    return {
+        "profile": name,
+        "saves": total,
+        "saves_per_sec": round(total / elapsed, 1),
+        "reads_per_sec": round(reads / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--saves", type=int, default=25, help="saves per worker")
+    ap.add_argument("--readers", type=int, default=4, help="concurrent list queries during the test")
+    ap.add_argument("--dir", default=".", help="where to put the scratch database (use a real disk)")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = [
+        await run_profile("sqlite-defaults", None, args.concurrency, args.saves, args.readers, args.dir),
+        await run_profile("tuned", SQLITE_PRAGMAS, args.concurrency, args.saves, args.readers, args.dir),
+    ]
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+"""
+Cold start benchmark.
+
+Starts the app in a fresh Python process again and again (import main, then
+the lifespan startup, exactly as uvicorn runs it) against a scratch SQLite
+database that has been migrated once, and reports:
+  - ready: wall time from spawning the process to the app being ready to serve
+  - interpreter: the same for a bare `python -c pass`, the floor under it
+  - the built-in startup profile of each run (startup_profile.py): each init
+    step, and the slowest imports, as medians over the runs
+
+The first run is a warm-up (it writes .pyc files and creates the demo account)
+and is not counted; the OS file cache stays warm, as it does on a restart.
+Use --max-ready to fail (exit 1) when the median goes above a budget, e.g. in CI.
+
+Run from the backend folder:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --json results.json --max-ready 2.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import asyncio, json
+import main, startup_profile
+
+async def run():
+    async with main.lifespan(main.app):
+        print("PROFILE " + json.dumps(startup_profile.report(40)), flush=True)
+
+asyncio.run(run())
+"""
+
+
+def spawn(args: list, env: dict) -> tuple[float, dict | None]:
+    """
+    Runs one process; returns (seconds until it printed its profile, or exited, and the profile).
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    profile = None
+    for line in proc.stdout:
+        if line.startswith("PROFILE "):
+            ready = time.perf_counter() - start
+            profile = json.loads(line[len("PROFILE "):])
+            break
+    else:
+        ready = time.perf_counter() - start
+    proc.stdout.read()
+    stderr = proc.stderr.read()
+    if proc.wait() != 0:
+        raise SystemExit(f"{' '.join(args[:2])} failed:\n{stderr}")
+    return ready, profile
+
+
+def summary(values: list[float]) -> dict:
+    return {
+        "median": round(statistics.median(values), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=10, help="counted cold starts")
+    ap.add_argument("--top", type=int, default=15, help="imports to list")
+    ap.add_argument("--max-ready", type=float, help="fail if the median ready time is above this many seconds")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "SECRET_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}",
+        "PHOTO_CACHE_DIR": os.path.join(tmp, "photos"),
+        "POI_INDEX_PATH": os.path.join(tmp, "poi_index.npz"),
+        "PYTHONPATH": BACKEND_DIR,
+        "STARTUP_PROFILE": "false",
+        "DEMO_ACCOUNT_ENABLED": "true",  # as in local development; startup then checks for the account
+    }
+    subprocess.run([sys.executable, "migrations.py", "upgrade"], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    spawn([sys.executable, "-c", CHILD], env)  # warm-up
+    floor, ready, profiles = [], [], []
+    for _ in range(args.runs):
+        floor.append(spawn([sys.executable, "-c", "pass"], env)[0])
+        seconds, profile = spawn([sys.executable, "-c", CHILD], env)
+        ready.append(seconds)
+        profiles.append(profile)
+
+    steps = {}
+    for profile in profiles:
+        for entry in profile["steps"]:
+            steps.setdefault(entry["step"], []).append(entry["seconds"])
+    imports = {}
+    for profile in profiles:
+        for entry in profile["imports"]:
+            imports.setdefault(entry["module"], []).append(entry["seconds"])
+    slowest = sorted(imports.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+
+    report = {
+        "runs": args.runs,
+        "ready_seconds": summary(ready),
+        "interpreter_seconds": summary(floor),
+        "profiled_seconds": summary([p["total_seconds"] for p in profiles]),
+        "modules_imported": profiles[-1]["modules_imported"],
+        "steps_median_seconds": {name: round(statistics.median(v), 4) for name, v in steps.items()},
+        "imports_median_seconds": {name: round(statistics.median(v), 4) for name, v in slowest},
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.max_ready is not None and report["ready_seconds"]["median"] > args.max_ready:
+        sys.exit(f"Median cold start {report['ready_seconds']['median']:.3f}s is over the {args.max_ready}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Local stand-ins for the Google APIs the backend calls, for load testing
+without spending quota:
+
+- Places API (New) Text Search:   POST /v1/places:searchText
+- Places API (New) photo media:   GET  /v1/places/{id}/photos/{photo}/media (redirects to the image)
+- Places Text Search / Details:   GET  /maps/api/place/textsearch/json, /maps/api/place/details/json
+- Geocoding:                      GET  /maps/api/geocode/json
+- Gemini (REST transport):        POST /v1beta/models/{model}:generateContent / :streamGenerateContent
+
+Every call sleeps for FAKE_LATENCY_MS (+/- FAKE_JITTER_MS); Gemini calls use
+FAKE_LLM_LATENCY_MS instead. A FAKE_ERROR_RATE fraction of calls fails with a
+500 or 429. Call counts per endpoint are served at GET /_stats
+(POST /_reset clears them, POST /_config changes the settings at runtime).
+
+Run on its own with:
+    uvicorn fake_upstreams:app --port 9100
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse, Response
+
+CONFIG = {
+    "latency_ms": float(os.getenv("FAKE_LATENCY_MS", "80")),
+    "jitter_ms": float(os.getenv("FAKE_JITTER_MS", "20")),
+    "llm_latency_ms": float(os.getenv("FAKE_LLM_LATENCY_MS", "1500")),
+    "error_rate": float(os.getenv("FAKE_ERROR_RATE", "0")),
+}
+
+calls = Counter()
+errors = Counter()
+
+app = FastAPI(title="Fake Google upstreams")
+
+ACTIVITIES = [
+    "Visit the old fort and the city museum.",
+    "Lunch at a popular local restaurant.",
+    "Sunset walk along the lake promenade.",
+    "Explore the spice market and street food stalls.",
+    "Relax at the hotel spa in the afternoon.",
+    "Guided heritage walk through the old quarter.",
+    "Day trip to the hill viewpoint and waterfall.",
+]
+
+
+async def simulate(endpoint: str, latency_ms: float | None = None):
+    """
+    Counts the call, waits like the real API would and maybe fails.
+    Returns an error response, or None for success.
+    """
+    calls[endpoint] += 1
+    base = CONFIG["latency_ms"] if latency_ms is None else latency_ms
+    delay = max(0.0, base + random.uniform(-CONFIG["jitter_ms"], CONFIG["jitter_ms"]))
+    await asyncio.sleep(delay / 1000)
+    if random.random() < CONFIG["error_rate"]:
+        errors[endpoint] += 1
+        code = random.choice([429, 500])
+        return JSONResponse({"error": {"code": code, "message": "injected failure"}}, status_code=code)
+    return None
+
+
+def _seed(*parts) -> random.Random:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _fake_place(rng: random.Random, lat: float, lng: float, query: str, index: int) -> dict:
+    place_id = f"fake_{_seed(query, round(lat, 3), round(lng, 3), index).randrange(10**10)}"
+    return {
+        "id": place_id,
+        "name": f"{query.title()} #{index + 1}",
+        "address": f"{rng.randint(1, 200)} Main Road",
+        "lat": lat + rng.uniform(-0.02, 0.02),
+        "lng": lng + rng.uniform(-0.02, 0.02),
+        "rating": round(rng.uniform(3.5, 5.0), 1),
+        "reviews": rng.randint(10, 5000),
+    }
+
+
+# ---------------- Places API (New) ----------------
+
+@app.post("/v1/places:searchText")
+async def places_search_text(request: Request):
+    if (failure := await simulate("places.searchText")) is not None:
+        return failure
+    body = await request.json()
+    query = body.get("textQuery", "")
+    circle = body.get("locationBias", {}).get("circle", {}).get("center", {})
+    lat, lng = circle.get("latitude", 0.0), circle.get("longitude", 0.0)
+    rng = _seed(query, lat, lng)
+    places = []
+    for i in range(min(int(body.get("pageSize") or body.get("maxResultCount") or 10), 20)):
+        p = _fake_place(rng, lat, lng, query, i)
+        places.append({
+            "id": p["id"],
+            "displayName": {"text": p["name"], "languageCode": "en"},
+            "formattedAddress": p["address"],
+            "location": {"latitude": p["lat"], "longitude": p["lng"]},
+            "rating": p["rating"],
+            "userRatingCount": p["reviews"],
+            "types": ["point_of_interest", "establishment"],
+            "websiteUri": f"https://example.com/{p['id']}",
+            "regularOpeningHours": {"openNow": True, "weekdayDescriptions": ["Monday: 9:00 AM – 10:00 PM"]},
+            "photos": [{
+                "name": f"places/{p['id']}/photos/photo_{i}", "widthPx": 1600, "heightPx": 1200,
+                "authorAttributions": [{"displayName": "A Photographer", "uri": "https://example.com"}],
+            }],
+        })
+    return {"places": places}
+
+
+@app.get("/v1/places/{place_id}/photos/{photo_id}/media")
+async def photo_media(place_id: str, photo_id: str, maxWidthPx: int = 400):
+    if (failure := await simulate("places.media")) is not None:
+        return failure
+    return RedirectResponse(f"/_photos/{photo_id}?w={maxWidthPx}", status_code=302)
+
+
+@app.get("/_photos/{photo_id}")
+async def photo_bytes(photo_id: str, w: int = 400):
+    # roughly JPEG-sized: ~0.1 byte per pixel at 4:3
+    size = max(1024, min(w, 4800) * min(w, 4800) * 3 // 4 // 10)
+    body = hashlib.sha256(f"{photo_id}|{w}".encode()).digest() * (size // 32 + 1)
+    return Response(body[:size], media_type="image/jpeg")
+
+
+# ---------------- Legacy Places + Geocoding ----------------
+
+@app.get("/maps/api/place/textsearch/json")
+async def legacy_text_search(query: str = "", location: str = "0,0"):
+    if (failure := await simulate("place.textsearch")) is not None:
+        return failure
+    lat, lng = (float(v) for v in location.split(","))
+    rng = _seed(query, location)
+    results = []
+    for i in range(10):
+        p = _fake_place(rng, lat, lng, query, i)
+        results.append({
+            "place_id": p["id"], "name": p["name"], "formatted_address": p["address"],
+            "geometry": {"location": {"lat": p["lat"], "lng": p["lng"]}},
+            "rating": p["rating"], "user_ratings_total": p["reviews"], "types": ["point_of_interest"],
+        })
+    return {"status": "OK", "results": results}
+
+
+@app.get("/maps/api/place/details/json")
+async def legacy_details(place_id: str = ""):
+    if (failure := await simulate("place.details")) is not None:
+        return failure
+    rng = _seed(place_id)
+    return {"status": "OK", "result": {
+        "name": f"Place {place_id[-4:]}",
+        "formatted_address": f"{rng.randint(1, 200)} Main Road",
+        "geometry": {"location": {"lat": rng.uniform(-60, 60), "lng": rng.uniform(-170, 170)}},
+        "rating": round(rng.uniform(3.5, 5.0), 1),
+        "user_ratings_total": rng.randint(10, 5000),
+        "website": f"https://example.com/{place_id}",
+        "types": ["point_of_interest"],
+        "photos": [{"photo_reference": f"ref_{place_id}", "width": 1600, "height": 1200}],
+    }}
+
+
+@app.get("/maps/api/geocode/json")
+async def geocode(address: str = ""):
+    if (failure := await simulate("geocode")) is not None:
+        return failure
+    rng = _seed(address.lower())
+    return {"status": "OK", "results": [{
+        "formatted_address": address,
+        "geometry": {"location": {"lat": rng.uniform(8, 35), "lng": rng.uniform(68, 97)}},
+    }]}
+
+
+# ---------------- Gemini ----------------
+
+def _fake_plan_text(prompt: str) -> list[str]:
+    match = re.search(r"Generate a (\d+)-day", prompt)
+    days = int(match.group(1)) if match else 0
+    rng = _seed(prompt)
+    if not days:
+        return [f"I'd recommend {rng.choice(['the first', 'the second'])} place on the list. "
+                "It matches your mood well."]
+    pieces = ["Here's your plan!\n\n"]
+    for day in range(1, days + 1):
+        bullets = "\n".join(f"- {a}" for a in rng.sample(ACTIVITIES, 3))
+        pieces.append(f"**Day {day}:**\n{bullets}\n\n")
+    return pieces
+
+
+def _prompt_of(body: dict) -> str:
+    try:
+        return body["contents"][0]["parts"][0]["text"]
+    except (KeyError, IndexError):
+        return ""
+
+
+def _candidate(text: str, finished: bool) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    body = await request.json()
+    pieces = _fake_plan_text(_prompt_of(body))
+
+    if action == "generateContent":
+        if (failure := await simulate("gemini.generateContent", CONFIG["llm_latency_ms"])) is not None:
+            return failure
+        return _candidate("".join(pieces), finished=True)
+
+    # streamGenerateContent: the REST transport reads a streamed JSON array
+    if (failure := await simulate("gemini.streamGenerateContent", CONFIG["llm_latency_ms"] / (len(pieces) + 1))) is not None:
+        return failure
+
+    async def stream():
+        yield "["
+        for i, piece in enumerate(pieces):
+            if i:
+                yield ",\n"
+                await asyncio.sleep(CONFIG["llm_latency_ms"] / (len(pieces) + 1) / 1000)
+            yield json.dumps(_candidate(piece, finished=i == len(pieces) - 1))
+        yield "]"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+# ---------------- Control ----------------
+
+@app.get("/_stats")
+async def stats():
+    return {"calls": dict(calls), "errors": dict(errors), "config": CONFIG}
+
+
+@app.post("/_reset")
+async def reset():
+    calls.clear()
+    errors.clear()
+    return {"ok": True}
+
+
+@app.post("/_config")
+async def configure(request: Request):
+    CONFIG.update({k: float(v) for k, v in (await request.json()).items() if k in CONFIG})
+    return CONFIG
@@ -0,0 +1,259 @@
+"""
+End-to-end load test for the API, using local stand-ins for Google and Gemini.
+
+Starts benchmarks/fake_upstreams.py and the real app (main:app) under uvicorn,
+with the app's upstream URLs pointed at the fakes and a scratch SQLite database.
+Then, for each concurrency level, it drives a weighted mix of
+/api/itinerary, /api/places/search, /api/ai/recommend, /api/itinerary/save and
+/api/itinerary/my for a fixed duration. For every endpoint it reports
+p50/p95/p99 latency, requests per second and errors, plus how many calls
+reached each fake upstream. Results are written as JSON so runs can be compared.
+
+Run from the backend folder:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --concurrency 1,8,32 --duration 20 --latency-ms 120 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+DEMO_EMAIL = "demo@dishanveshi.com"
+DEMO_PASSWORD = "demo123"
+
+# A few popular destinations dominate real traffic.
+DESTINATIONS = ["Pune", "Goa", "Jaipur", "Manali", "Kochi", "Varanasi", "Udaipur", "Rishikesh"]
+CITY_CENTERS = [(18.5204, 73.8567), (15.2993, 74.1240), (26.9124, 75.7873), (32.2432, 77.1892)]
+DEFAULT_MIX = "itinerary=1,places=4,ai=1,save=2,list=2"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def start_server(app: str, port: int, cwd: str, env: dict, verbose: bool) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env={**os.environ, **env},
+        stdout=None if verbose else subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server for {url} exited with code {proc.returncode}")
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+def build_request(kind: str, rng: random.Random) -> tuple[str, str, dict | None, dict | None]:
+    """
+    Returns (method, path, json body, query params) for one request of this kind.
+    """
+    if kind == "itinerary":
+        return "POST", "/api/itinerary", {
+            "destination": rng.choice(DESTINATIONS),
+            "days": rng.choice([2, 3, 5]),
+            "travel_type": rng.choice(["cultural", "relaxing", "adventure"]),
+            "budget": rng.choice(["low", "medium"]),
+            "mood": "excited",
+        }, None
+    if kind == "places":
+        lat, lng = rng.choice(CITY_CENTERS)
+        return "POST", "/api/places/search", {
+            "lat": lat + rng.uniform(-0.01, 0.01),
+            "lng": lng + rng.uniform(-0.01, 0.01),
+            "type": rng.choice(["food", "hotel"]),
+        }, None
+    if kind == "ai":
+        return "POST", "/api/ai/recommend", {
+            "mood": rng.choice(["tired", "excited", "hungry"]),
+            "places_list": "Cafe Mocha, Hotel Sunrise, Fort Museum",
+        }, None
+    if kind == "save":
+        return "POST", "/api/itinerary/save", {
+            "destination": rng.choice(DESTINATIONS),
+            "days": 2,
+            "plan": [{"day": 1, "summary": "Fort walk", "places": []}, {"day": 2, "summary": "Beach", "places": []}],
+        }, None
+    return "GET", "/api/itinerary/my", None, {"limit": 20}
+
+
+async def run_level(base_url: str, fake_url: str, token: str, concurrency: int, duration: float, mix: dict, seed: int) -> dict:
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    samples = defaultdict(list)
+    failures = defaultdict(int)
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120.0, limits=limits) as client:
+        await client.post(fake_url + "/_reset")
+        deadline = time.monotonic() + duration
+
+        async def worker(worker_id: int):
+            rng = random.Random(seed * 1000 + worker_id)
+            while time.monotonic() < deadline:
+                kind = rng.choices(kinds, weights)[0]
+                method, path, body, params = build_request(kind, rng)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body, params=params)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples[kind].append(time.perf_counter() - start)
+                if not ok:
+                    failures[kind] += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - start
+        upstream = (await client.get(fake_url + "/_stats")).json()
+
+    endpoints = {}
+    for kind, latencies in sorted(samples.items()):
+        endpoints[kind] = {
+            "requests": len(latencies),
+            "errors": failures[kind],
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        }
+    total = sum(len(v) for v in samples.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "errors": sum(failures.values()),
+        "endpoints": endpoints,
+        "upstream_calls": upstream["calls"],
+        "upstream_errors": upstream["errors"],
+    }
+
+
+def print_level(result: dict):
+    print(f"\n== concurrency {result['concurrency']}: {result['requests']} requests, "
+          f"{result['rps']} req/s, {result['errors']} errors")
+    print(f"   {'endpoint':<10} {'reqs':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for kind, e in result["endpoints"].items():
+        print(f"   {kind:<10} {e['requests']:>6} {e['rps']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8} {e['errors']:>7}")
+    print(f"   upstream calls: {json.dumps(result['upstream_calls'])}")
+    print(f"   upstream errors: {json.dumps(result['upstream_errors'])}")
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. " + DEFAULT_MIX)
+    ap.add_argument("--latency-ms", type=float, default=80.0, help="fake Google latency")
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--llm-latency-ms", type=float, default=1500.0, help="fake Gemini latency")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--verbose", action="store_true", help="show the servers' own output")
+    ap.add_argument("--out", help="JSON results file (default: benchmarks/results/loadtest-<time>.json)")
+    args = ap.parse_args()
+
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    levels = [int(c) for c in args.concurrency.split(",")]
+    fake_port, app_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = start_server("fake_upstreams:app", fake_port, BENCH_DIR, {
+            "FAKE_LATENCY_MS": str(args.latency_ms),
+            "FAKE_JITTER_MS": str(args.jitter_ms),
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_ERROR_RATE": str(args.error_rate),
+        }, args.verbose)
+        api = start_server("main:app", app_port, BACKEND_DIR, {
+            "SECRET_KEY": "loadtest-secret",
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(tmp, 'loadtest.db')}",
+            "DB_AUTO_MIGRATE": "true",
+            "DEMO_ACCOUNT_ENABLED": "true",
+            # fake POIs and photos stay in the scratch dir, never in the real index or cache
+            "POI_INDEX_PATH": os.path.join(tmp, "poi_index.npz"),
+            "PHOTO_CACHE_DIR": os.path.join(tmp, "photo_cache"),
+            "GOOGLE_MAPS_API_KEY": "fake-key",
+            "GEMINI_API_KEY": "fake-key",
+            "GEMINI_TRANSPORT": "rest",
+            "GEMINI_API_ENDPOINT": fake_url,
+            "GOOGLE_PLACES_BASE_URL": fake_url,
+            "GOOGLE_MAPS_BASE_URL": fake_url,
+        }, args.verbose)
+        try:
+            await wait_until_up(fake_url + "/_stats", fake)
+            await wait_until_up(base_url + "/api/health", api)
+
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                await client.post("/api/auth/register", json={"email": DEMO_EMAIL, "password": DEMO_PASSWORD})
+                login = await client.post("/api/auth/login", json={"email": DEMO_EMAIL, "password": DEMO_PASSWORD})
+                login.raise_for_status()
+                token = login.json()["access_token"]
+
+            results = []
+            for level in levels:
+                result = await run_level(base_url, fake_url, token, level, args.duration, mix, args.seed)
+                print_level(result)
+                results.append(result)
+        finally:
+            for proc in (api, fake):
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            "duration_s": args.duration,
+            "mix": mix,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+            "error_rate": args.error_rate,
+        },
+        "levels": results,
+    }
+    out = args.out or os.path.join(BENCH_DIR, "results", f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
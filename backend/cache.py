@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A small in-process LRU cache where every entry also expires after a TTL.
+    Keeps hit/miss counters so callers can report how well it works.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        # a membership check does not count as a hit or a miss
+        item = self._data.get(key)
+        return item is not None and item[0] > time.monotonic()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one running task.
+    Every caller awaits the same result; the task is only cancelled when
+    all of its callers have gone away.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict = {}  # key -> [task, waiters]
+
+    async def do(self, key, fn):
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._flights[key] = [asyncio.create_task(fn()), 0]
+
+            def forget(_task, key=key, flight=flight):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+            flight[0].add_done_callback(forget)
+        else:
+            self.coalesced += 1
+
+        flight[1] += 1
+        try:
+            return await asyncio.shield(flight[0])
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not flight[0].done():
+                flight[0].cancel()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+class StreamFlight:
+    """
+    SingleFlight for producers that send a series of events.
+    Concurrent subscribers with the same key share one producer task; each
+    one gets every event from the start, including those sent before it
+    joined. The producer is cancelled when all of its subscribers have gone away.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict = {}  # key -> [task, events, subscriber queues]
+
+    async def subscribe(self, key, fn):
+        """
+        Yields the events of `fn(publish)`, a coroutine that calls
+        publish(event) for each event; the stream ends when it returns.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            events, queues = [], set()
+
+            def publish(event):
+                events.append(event)
+                for queue in queues:
+                    queue.put_nowait(event)
+
+            flight = self._flights[key] = [asyncio.create_task(fn(publish)), events, queues]
+
+            def finish(task, key=key, flight=flight):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if not task.cancelled():
+                    task.exception()  # the producer reports its own errors as events
+                for queue in flight[2]:
+                    queue.put_nowait(self._END)
+
+            flight[0].add_done_callback(finish)
+        else:
+            self.coalesced += 1
+
+        task, events, queues = flight
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in events:
+            queue.put_nowait(event)
+        queues.add(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if event is self._END:
+                    return
+                yield event
+        finally:
+            queues.discard(queue)
+            if not queues and not task.done():
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
@@ -1,17 +1,96 @@
-import os 
+import os
+from sqlalchemy import event
 from sqlalchemy.orm import declarative_base
 # database.py (example)
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./travel_app.db")
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+
+import metrics
+from settings import settings
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def normalize_database_url(url: str) -> str:
+    """
+    Hosting providers hand out "postgres://..." URLs; SQLAlchemy needs the async driver spelled out.
+    """
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# --- Database profile ---
+DATABASE_URL = normalize_database_url(settings.database_url)
+DB_ECHO = _env_bool("DB_ECHO", "false")  # log every SQL statement (development only)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+
+# Applied to every new SQLite connection. WAL lets readers run next to a writer,
+# and synchronous=NORMAL is safe with WAL while skipping an fsync per commit.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+
+def create_engine_for(url: str, sqlite_pragmas: dict | None = SQLITE_PRAGMAS, **overrides):
+    """
+    Builds an async engine with the pool settings above.
+    For SQLite the pragmas are set on every new connection;
+    pass sqlite_pragmas=None to keep SQLite's defaults.
+    """
+    options = {
+        "echo": DB_ECHO,
+        "future": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    options.update(overrides)
+    new_engine = create_async_engine(url, **options)
+
+    if new_engine.dialect.name == "sqlite" and sqlite_pragmas:
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, _record):
+            cursor = dbapi_connection.cursor()
+            for name, value in sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
+
+engine = create_engine_for(DATABASE_URL)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
-Base = declarative_base()
-async def init_db():
+
+def pool_stats() -> dict:
     """
-    A function to initialize the database and create all tables.
+    Connection pool usage, read at scrape time by /api/metrics.
+    Pools without these counters (e.g. NullPool) report nothing.
     """
-    async with engine.begin() as conn:
-        # This command creates all tables defined by models that inherit from Base
-        # await conn.run_sync(Base.metadata.drop_all) # Use this to drop tables first if needed
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        ("size",): pool.size(),
+        ("checked_out",): pool.checkedout(),
+        ("checked_in",): pool.checkedin(),
+        ("overflow",): max(0, pool.overflow()),
+    }
+
+
+metrics.Gauge("dishanveshi_db_pool_connections", "Database connection pool usage.", pool_stats, ("state",))
+
+# The schema itself is managed by migrations.py; startup only checks its version.
+Base = declarative_base()
@@ -0,0 +1,130 @@
+import os
+import time
+import httpx
+
+import metrics
+
+# --- Configuration ---
+# Connection pool settings for the outbound clients. Every upstream host gets
+# its own client, so these limits are effectively per-host caps.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# The upstream hosts we talk to. The key is what service functions ask for.
+# Base URLs can be pointed at local stand-ins (see benchmarks/fake_upstreams.py).
+UPSTREAMS = {
+    "places": os.getenv("GOOGLE_PLACES_BASE_URL", "https://places.googleapis.com"),
+    "maps": os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com"),
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """
+    Passes the response body through, counting bytes, and reports
+    the call to metrics once the body has been read and closed.
+    """
+
+    def __init__(self, inner, on_close):
+        self._inner = inner
+        self._on_close = on_close
+        self.nbytes = 0
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            self.nbytes += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._inner.aclose()
+        finally:
+            self._on_close(self.nbytes)
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the pooled transport so every outbound call records
+    latency, outcome and response bytes per API (see metrics.py).
+    The API name is metrics.api_label of the path, unless the request
+    names it with extensions={"api": ...}, which redirects keep.
+    """
+
+    def __init__(self, upstream: str, inner: httpx.AsyncBaseTransport):
+        self._upstream = upstream
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        api = request.extensions.get("api") or metrics.api_label(self._upstream, request.url.path)
+        start = time.perf_counter()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except Exception:
+            metrics.record_upstream(api, time.perf_counter() - start, "failed")
+            raise
+
+        outcome = "ok" if response.status_code < 400 else "error"
+
+        def on_close(nbytes: int):
+            metrics.record_upstream(api, time.perf_counter() - start, outcome, nbytes)
+
+        response.stream = _CountingStream(response.stream, on_close)
+        return response
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def _build_client(name: str, base_url: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        HTTP_READ_TIMEOUT,
+        connect=HTTP_CONNECT_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=HTTP2_ENABLED)
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=_InstrumentedTransport(name, transport),
+    )
+
+
+async def start():
+    """
+    Creates one long-lived client per upstream host.
+    Called once from the app lifespan.
+    """
+    for name, base_url in UPSTREAMS.items():
+        if name not in _clients:
+            _clients[name] = _build_client(name, base_url)
+
+
+async def close():
+    """
+    Closes every pooled client. Called on shutdown.
+    """
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Returns the shared client for an upstream host.
+    Falls back to creating it lazily (e.g. when used outside the app lifespan).
+    """
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = _build_client(name, UPSTREAMS[name])
+    return client
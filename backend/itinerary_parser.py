@@ -0,0 +1,167 @@
+import re
+
+# --- Precompiled patterns ---
+# A day marker at the start of a line: "Day 3:", "day 3)", "Day3 -", "## Day 3".
+_DAY_MARKER = re.compile(r"^[ \t]*(?:#{1,6}[ \t]*)?day[^\S\n]*(\d+)[:\-\)]?", re.IGNORECASE | re.MULTILINE)
+# A line (other than a day's first) that starts with a "-" bullet.
+_BULLET_LINE = re.compile(r"\n[^\S\n]*-")
+# Every marker contains this; text without it can't finish a day.
+_DAY_WORD = re.compile(r"day", re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_RESTAURANT_WORDS = re.compile(r"\b(restaurant|food|dinner|lunch|breakfast|cafe|snack)\b", re.IGNORECASE)
+_HOTEL_WORDS = re.compile(r"\b(hotel|resort|stay|accommodat)\b", re.IGNORECASE)
+
+
+def _strip_markup(text: str) -> str:
+    # "*", "**" and "***" are markdown emphasis; "•" is treated like a "-" bullet.
+    # Two str.replace calls are several times faster than str.translate with a table.
+    return text.replace("*", "").replace("•", "-")
+
+
+def classify_poi_query(summary: str) -> str:
+    """
+    Picks a short Places search query from a day's summary:
+    "hotel", "restaurant" or (by default) "tourist attraction".
+    """
+    if _HOTEL_WORDS.search(summary):
+        return "hotel"
+    if _RESTAURANT_WORDS.search(summary):
+        return "restaurant"
+    return "tourist attraction"
+
+
+def _fallback_plan(raw: str, days: int) -> list:
+    """
+    Used when the text has no "Day N:" markers: split it into sentences
+    and spread them over the days.
+    """
+    text = _strip_markup(raw.replace("\r\n", "\n").strip())
+    text = _BLANK_LINES.sub("\n\n", text)
+    sentences = _SENTENCE_END.split(text)
+
+    plan = []
+    if len(sentences) <= days:
+        for idx in range(days):
+            summary = sentences[idx].strip() if idx < len(sentences) else ""
+            plan.append({"day": idx+1, "summary": summary, "places": []})
+    else:
+        chunk_size = max(1, len(sentences) // days)
+        for idx in range(days):
+            chunk = sentences[idx*chunk_size:(idx+1)*chunk_size]
+            summary = " ".join(s.strip() for s in chunk)
+            plan.append({"day": idx+1, "summary": summary, "places": []})
+    return plan
+
+
+def _day_summary(body: str) -> str:
+    """
+    One day's text as a single line. A "-" bullet after the day's first line
+    is rendered as " • "; a bare "-" swallows the line break, so the next
+    line stays as is.
+    """
+    if _BULLET_LINE.search(body) is None:
+        # no bullets: only whitespace to collapse, in one C-level pass
+        return " ".join(body.split())
+
+    tokens = []
+    glue = False
+    for line in body.split("\n"):
+        text = line.strip()
+        if not text:
+            continue
+        if glue:
+            glue = False
+        elif tokens and text[0] == "-":
+            glue = len(text) == 1
+            text = "• " + text[1:].lstrip()
+        tokens.append(text)
+    return " ".join(" ".join(tokens).split())
+
+
+class DayStreamParser:
+    """
+    Single-pass tokenizer for Gemini itinerary text.
+    Text can be fed in arbitrary chunks. It is buffered until it may hold a
+    day marker; then the complete lines are scanned once for markers (one
+    regex pass, not one call per line), and the text between two markers
+    becomes that day's summary.
+    feed() returns the days completed so far (a day is complete once the next
+    marker arrives); finish() returns the rest, padded to `days` entries.
+    """
+
+    def __init__(self, days: int):
+        self.days = days
+        self.emitted = 0
+        self._chunks = []
+        self._pending = ""        # text not read yet: an incomplete last line, or lines without a marker
+        self._marker_ahead = False  # _pending contains "day"
+        self._day = None          # the day currently being read
+        self._body = []           # text of that day read so far
+        self._seen_marker = False
+
+    def _close_day(self) -> dict:
+        entry = {"day": self._day, "summary": _day_summary("".join(self._body)), "places": []}
+        self._day = None
+        self._body = []
+        return entry
+
+    def _read_lines(self, text: str, out: list):
+        text = _strip_markup(text)
+        pos = 0
+        for marker in _DAY_MARKER.finditer(text):
+            if self._day is not None:
+                self._body.append(text[pos:marker.start()])
+                out.append(self._close_day())
+            # text before the first marker is preamble ("Sure! Here's your plan:")
+            self._seen_marker = True
+            self._day = int(marker.group(1))
+            pos = marker.end()
+        if self._day is not None:
+            self._body.append(text[pos:])
+
+    def feed(self, chunk: str) -> list:
+        self._chunks.append(chunk)
+        # "day" may straddle two chunks
+        start = max(0, len(self._pending) - 2)
+        self._pending += chunk
+        if not self._marker_ahead:
+            self._marker_ahead = _DAY_WORD.search(self._pending, start) is not None
+        cut = self._pending.rfind("\n") + 1 if self._marker_ahead else 0
+        if not cut:
+            return []
+
+        text, self._pending = self._pending[:cut], self._pending[cut:]
+        self._marker_ahead = _DAY_WORD.search(self._pending) is not None
+        complete = []
+        self._read_lines(text, complete)
+        self.emitted += len(complete)
+        return complete
+
+    def finish(self) -> list:
+        rest = []
+        if self._pending:
+            self._read_lines(self._pending, rest)
+            self._pending = ""
+
+        if not self._seen_marker:
+            rest = _fallback_plan("".join(self._chunks), self.days)[self.emitted:]
+        else:
+            if self._day is not None:
+                rest.append(self._close_day())
+            # Ensure list length matches days
+            total = self.emitted + len(rest)
+            for fill_day in range(total+1, self.days+1):
+                rest.append({"day": fill_day, "summary": "", "places": []})
+
+        self.emitted += len(rest)
+        return rest
+
+
+def parse_itinerary(raw: str, days: int) -> list:
+    """
+    Turns raw Gemini text into a list of {"day", "summary", "places"} dicts,
+    at least `days` entries long.
+    """
+    parser = DayStreamParser(days)
+    return parser.feed(raw) + parser.finish()
@@ -0,0 +1,191 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+import orjson
+
+import CRUD
+import metrics
+import scheduler
+import services
+from database import async_session
+
+# --- Configuration ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))                  # itineraries generated at once, per process
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "200"))            # queued jobs across all users
+JOB_MAX_PER_USER = int(os.getenv("JOB_MAX_PER_USER", "5"))        # queued + running jobs per user
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "86400"))    # jobs and results are deleted after this
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # a running job older than this is retried
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))      # idle workers re-check the table this often
+JOB_LONG_POLL_MAX_SECONDS = float(os.getenv("JOB_LONG_POLL_MAX_SECONDS", "30"))
+JOB_CLEANUP_INTERVAL_SECONDS = float(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", "600"))
+
+FINISHED = ("done", "failed")
+
+_jobs = metrics.Counter("dishanveshi_itinerary_jobs_total", "Itinerary jobs by outcome.", ("outcome",))
+
+_wakeup = asyncio.Event()          # set on submit, so an idle worker starts right away
+_finished = asyncio.Event()        # replaced after every finished job; long polls wait on it
+_workers: list[asyncio.Task] = []
+_running = 0
+metrics.Gauge("dishanveshi_itinerary_jobs_running", "Itinerary jobs running in this process.",
+              lambda: _running)
+
+
+class JobQueueFull(Exception):
+    """
+    Raised on submit when the queue (or the user's share of it) is full.
+    """
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+
+async def submit(db, user_id: int, request: dict):
+    """
+    Queues an itinerary request (the arguments of services.generate_itinerary)
+    and returns the job row.
+    """
+    queued, active = await CRUD.count_jobs(db, user_id)
+    if queued >= JOB_MAX_QUEUE:
+        _jobs.inc("rejected")
+        raise JobQueueFull("Itinerary queue is full", retry_after=max(1, int(JOB_POLL_SECONDS * 5)))
+    if active >= JOB_MAX_PER_USER:
+        _jobs.inc("rejected")
+        raise JobQueueFull(f"At most {JOB_MAX_PER_USER} itinerary jobs in progress per user",
+                           retry_after=max(1, int(JOB_POLL_SECONDS * 5)))
+    job = await CRUD.create_job(db, user_id, orjson.dumps(request).decode())
+    _jobs.inc("submitted")
+    _wakeup.set()
+    return job
+
+
+async def wait(user_id: int, job_id: str, timeout: float):
+    """
+    The job, once it has finished or `timeout` seconds (capped at
+    JOB_LONG_POLL_MAX_SECONDS) have passed, whichever comes first.
+    Jobs finished by this process wake the wait at once; the table
+    is re-read every JOB_POLL_SECONDS for those run by other processes.
+    Each read uses its own short session, so a long poll never holds
+    a pooled connection while it sleeps.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(timeout, JOB_LONG_POLL_MAX_SECONDS)
+    while True:
+        finished = _finished
+        async with async_session() as db:
+            job = await CRUD.get_job(db, user_id, job_id)
+        remaining = deadline - loop.time()
+        if job is None or job.status in FINISHED or remaining <= 0:
+            return job
+        try:
+            await asyncio.wait_for(finished.wait(), min(remaining, JOB_POLL_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+
+
+def _notify_finished():
+    global _finished
+    finished, _finished = _finished, asyncio.Event()
+    finished.set()
+
+
+async def _run(job):
+    global _running
+    if job.attempts > JOB_MAX_ATTEMPTS:
+        async with async_session() as db:
+            await CRUD.finish_job(db, job.id, error=f"Gave up after {JOB_MAX_ATTEMPTS} attempts")
+        _jobs.inc("failed")
+        _notify_finished()
+        return
+
+    request = orjson.loads(job.request_json)
+    result = error = None
+    _running += 1
+    # nobody is waiting on the connection: queue behind interactive calls for quota
+    priority = scheduler.PRIORITY.set(scheduler.BATCH)
+    try:
+        plan = await services.generate_itinerary(**request)
+        if services.is_error_plan(plan):
+            # generation failed, it just says so in the plan instead of raising
+            error = plan[0]["summary"]
+        else:
+            result = orjson.dumps({"destination": request["destination"], "plan": plan}).decode()
+    except scheduler.UpstreamBusy as e:
+        # out of quota: not the job's fault, so it goes back in line
+        async with async_session() as db:
+            await CRUD.requeue_job(db, job.id)
+        _jobs.inc("requeued")
+        await asyncio.sleep(e.retry_after)
+        return
+    except asyncio.CancelledError:
+        # shutting down: let the next start (or another process) pick it up
+        async with async_session() as db:
+            await CRUD.requeue_job(db, job.id)
+        raise
+    except Exception as e:
+        error = f"Error generating itinerary: {e}"
+    finally:
+        scheduler.PRIORITY.reset(priority)
+        _running -= 1
+
+    async with async_session() as db:
+        await CRUD.finish_job(db, job.id, result_json=result, error=error)
+    _jobs.inc("failed" if error else "done")
+    _notify_finished()
+
+
+async def _worker():
+    while True:
+        _wakeup.clear()
+        try:
+            async with async_session() as db:
+                job = await CRUD.claim_job(db, JOB_LEASE_SECONDS)
+            if job is not None:
+                await _run(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # the database hiccuped; a claimed job comes back once its lease runs out
+            print(f"⚠️ Itinerary job worker error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _cleanup():
+    while True:
+        try:
+            async with async_session() as db:
+                deleted = await CRUD.delete_jobs_before(db, datetime.utcnow() - timedelta(seconds=JOB_TTL_SECONDS))
+            if deleted:
+                _jobs.inc("expired", amount=deleted)
+        except Exception as e:
+            print(f"⚠️ Itinerary job cleanup failed: {e}")
+        await asyncio.sleep(JOB_CLEANUP_INTERVAL_SECONDS)
+
+
+def start():
+    """
+    Starts the worker pool and the expiry sweep. Called from the app lifespan.
+    """
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(JOB_WORKERS))
+    _workers.append(asyncio.create_task(_cleanup()))
+
+
+async def stop():
+    """
+    Cancels the workers; jobs they were running go back in the queue.
+    """
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def stats() -> dict:
+    return {"workers": JOB_WORKERS, "running": _running}
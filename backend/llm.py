@@ -0,0 +1,193 @@
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from settings import settings
+
+# --- Configuration ---
+GEMINI_API_KEY = settings.gemini_api_key
+# Optional SDK overrides, e.g. GEMINI_TRANSPORT=rest and GEMINI_API_ENDPOINT=http://127.0.0.1:9100
+# to point at the local stand-in used by benchmarks/loadtest.py.
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+# Max Gemini calls running at once across the whole process.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Per-call timeout, enforced both by the SDK and by the awaiting coroutine.
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Import the SDK in the background once the app is up, so the first itinerary doesn't wait for it.
+LLM_PRELOAD = os.getenv("LLM_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# The SDK call is blocking, so it runs on its own bounded thread pool
+# and never on the event loop.
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_models: dict = {}
+_in_flight = 0
+_genai = None
+_genai_lock = threading.Lock()
+
+
+class LLMTimeoutError(Exception):
+    pass
+
+
+metrics.Gauge("dishanveshi_llm_in_flight", "Gemini calls currently running.", lambda: _in_flight)
+metrics.Gauge("dishanveshi_llm_max_concurrency", "Configured Gemini concurrency limit.", lambda: LLM_MAX_CONCURRENCY)
+
+
+def _sdk():
+    """
+    The google.generativeai module, imported and configured on first use.
+    It takes about half a second to import, so the server starts without it;
+    the first call pays that once, in a worker thread rather than on the event loop.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_KEY:
+                    genai.configure(
+                        api_key=GEMINI_API_KEY,
+                        transport=GEMINI_TRANSPORT,
+                        client_options={"api_endpoint": GEMINI_API_ENDPOINT} if GEMINI_API_ENDPOINT else None
+                    )
+                _genai = genai
+    return _genai
+
+
+def preload():
+    """
+    Starts importing the SDK on the worker pool (if a key is set and
+    LLM_PRELOAD is on). Called from the app lifespan after startup.
+    """
+    if GEMINI_API_KEY and LLM_PRELOAD:
+        _executor.submit(_sdk)
+
+
+def get_model(model_name: str):
+    """
+    Returns a shared GenerativeModel instance for this model name.
+    Blocking the first time (SDK import); call it from the worker threads.
+    """
+    model = _models.get(model_name)
+    if model is None:
+        model = _models[model_name] = _sdk().GenerativeModel(model_name)
+    return model
+
+
+def in_flight() -> int:
+    """
+    Number of Gemini calls currently running.
+    """
+    return _in_flight
+
+
+def _generate_sync(model_name: str, prompt: str, timeout: float) -> str:
+    response = get_model(model_name).generate_content(prompt, request_options={"timeout": timeout})
+    return response.text or ""
+
+
+async def generate(model_name: str, prompt: str, timeout: float | None = None) -> str:
+    """
+    Runs one Gemini generation off the event loop and returns the text.
+    Waits for a free slot if LLM_MAX_CONCURRENCY calls are already running.
+    Cancelling the awaiting task (e.g. on client disconnect) releases the slot
+    right away; the worker thread itself stops at the SDK timeout.
+    """
+    global _in_flight
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    loop = asyncio.get_running_loop()
+
+    async with _slots:
+        _in_flight += 1
+        start = time.perf_counter()
+        outcome, text = "failed", ""
+        try:
+            future = loop.run_in_executor(_executor, _generate_sync, model_name, prompt, timeout)
+            text = await asyncio.wait_for(future, timeout=timeout)
+            outcome = "ok"
+            return text
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Gemini call timed out after {timeout:g}s")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            _in_flight -= 1
+            metrics.record_upstream("gemini.generateContent", time.perf_counter() - start, outcome, len(text))
+
+
+def _stream_sync(model_name: str, prompt: str, timeout: float, loop, queue: asyncio.Queue, stop: threading.Event):
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # the event loop is already closed
+            pass
+
+    try:
+        response = get_model(model_name).generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            if stop.is_set():
+                break
+            try:
+                text = chunk.text
+            except ValueError:
+                # chunk without text parts (e.g. only safety metadata)
+                continue
+            put(("chunk", text))
+        put(("end", None))
+    except Exception as e:
+        put(("error", e))
+
+
+async def stream(model_name: str, prompt: str, timeout: float | None = None):
+    """
+    Streams one Gemini generation, yielding text chunks as they arrive.
+    Uses the same slots and timeout as generate(). Closing the generator
+    (e.g. on client disconnect) tells the worker thread to stop reading.
+    """
+    global _in_flight
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    async with _slots:
+        _in_flight += 1
+        start = time.perf_counter()
+        outcome, received = "failed", 0
+        try:
+            loop.run_in_executor(_executor, _stream_sync, model_name, prompt, timeout, loop, queue, stop)
+            deadline = loop.time() + timeout
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"Gemini call timed out after {timeout:g}s")
+                if kind == "chunk":
+                    received += len(value)
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    outcome = "ok"
+                    return
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            stop.set()
+            _in_flight -= 1
+            metrics.record_upstream("gemini.streamGenerateContent", time.perf_counter() - start, outcome, received)
+
+
+def shutdown():
+    """
+    Stops the worker threads. Called on app shutdown.
+    """
+    _executor.shutdown(wait=False, cancel_futures=True)
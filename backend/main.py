@@ -4,18 +4,23 @@
 # Stack: FastAPI + JWT + Async SQLAlchemy
 # ==========================================================
 
+import startup_profile  # first, so it times every import below
+from settings import settings
+
 from fastapi import (
-    FastAPI, Depends, HTTPException, status, Query
+    FastAPI, Depends, HTTPException, status, Query, Request
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, JSONResponse, Response
 from contextlib import asynccontextmanager
-from typing import Annotated, List
+from typing import Annotated
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import os
+import orjson
+import asyncio
 
 # ----------------- Internal Imports -----------------
 import models
@@ -23,7 +28,19 @@ import schemas
 import CRUD
 import services
 import security
-from database import init_db, async_session
+import http_client
+import llm
+import metrics
+import scheduler
+import resilience
+import poi_index
+import photo_cache
+import places_client
+import jobs
+import static_assets
+import migrations
+from responses import FastJSONResponse, RawJSONResponse, CompressionMiddleware, etag_matches
+from database import async_session
 from security import SECRET_KEY, ALGORITHM
 
 # ==========================================================
@@ -33,6 +50,12 @@ API_VERSION = "v1.0.0"
 APP_NAME = "Dishanveshi – Travel Intelligence API"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+# Demo account created at startup so the frontend's demo login works.
+# Off by default: its password is public. Set DEMO_ACCOUNT_ENABLED=true for local development.
+DEMO_ACCOUNT_ENABLED = os.getenv("DEMO_ACCOUNT_ENABLED", "false").lower() in ("1", "true", "yes")
+DEMO_EMAIL = os.getenv("DEMO_EMAIL", "demo@dishanveshi.com")
+DEMO_PASSWORD = os.getenv("DEMO_PASSWORD", "demo123")
 class LoginRequest(BaseModel):
     email: str
     password: str
@@ -44,10 +67,53 @@ class LoginRequest(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Starting Dishanveshi API...")
-    await init_db()
-    print("✅ Database initialized")
+    with startup_profile.step("database schema check"):
+        version = await migrations.check()
+    print(f"✅ Database schema at version {version}")
+    with startup_profile.step("http clients"):
+        await http_client.start()
+    print("✅ Upstream HTTP clients ready")
+    if DEMO_ACCOUNT_ENABLED:
+        with startup_profile.step("demo account"):
+            await ensure_demo_user()
+    autosave = None
+    if poi_index.POI_INDEX_ENABLED:
+        with startup_profile.step("poi index"):
+            loaded = await asyncio.to_thread(poi_index.poi_index.load)
+        if loaded:
+            print(f"✅ POI index loaded ({poi_index.poi_index.size} places)")
+        autosave = asyncio.create_task(poi_index.autosave())
+    with startup_profile.step("photo cache"):
+        await asyncio.to_thread(photo_cache.photo_cache.load)
+    print(f"✅ Photo cache ready ({photo_cache.photo_cache.stats()['files']} files)")
+    with startup_profile.step("frontend assets"):
+        app.state.assets = await asyncio.to_thread(static_assets.build)
+    print(f"✅ Frontend assets ready ({len(app.state.assets)} paths)")
+    with startup_profile.step("job workers"):
+        jobs.start()
+    print(f"✅ Itinerary job workers started ({jobs.JOB_WORKERS})")
+    total = startup_profile.finish()
+    print(f"✅ Ready in {total:.2f}s (GET /api/startup for the breakdown)")
+    if settings.startup_profile:
+        startup_profile.print_report()
+    llm.preload()
     yield
     print("🛑 Shutting down Dishanveshi API...")
+    await jobs.stop()
+    if autosave is not None:
+        autosave.cancel()
+        if poi_index.poi_index.dirty:
+            poi_index.poi_index.save()
+    await http_client.close()
+    llm.shutdown()
+    security.shutdown()
+
+
+async def ensure_demo_user():
+    async with async_session() as db:
+        if not await CRUD.get_user_by_email(db, email=DEMO_EMAIL):
+            await CRUD.create_user(db, schemas.UserCreate(email=DEMO_EMAIL, password=DEMO_PASSWORD))
+            print(f"✅ Demo account created ({DEMO_EMAIL})")
 
 # ==========================================================
 # APP INIT
@@ -55,7 +121,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=APP_NAME,
     version=API_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # ==========================================================
@@ -69,6 +136,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==========================================================
+# ERROR HANDLERS
+# ==========================================================
+@app.exception_handler(security.PasswordHasherBusy)
+async def password_hasher_busy(request: Request, exc: security.PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(resilience.CircuitOpen)
+async def upstream_down(request: Request, exc: resilience.CircuitOpen):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(resilience.BREAKER_COOLDOWN_SECONDS))}
+    )
+
+@app.exception_handler(jobs.JobQueueFull)
+async def job_queue_full(request: Request, exc: jobs.JobQueueFull):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(scheduler.UpstreamBusy)
+async def upstream_busy(request: Request, exc: scheduler.UpstreamBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# ==========================================================
+# METRICS
+# ==========================================================
+# gzip/brotli for large JSON bodies (big plans, long lists)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # ==========================================================
 # DATABASE DEPENDENCY
 # ==========================================================
@@ -85,9 +194,13 @@ AsyncDB = Annotated[AsyncSession, Depends(get_db)]
 # AUTH UTIL
 # ==========================================================
 async def get_current_user(
-    db: AsyncDB,
     token: str = Depends(oauth2_scheme)
 ):
+    # Warm tokens are answered from memory: no JWT decode, no database round trip.
+    principal = security.get_cached_principal(token)
+    if principal is not None:
+        return principal[1]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -99,10 +212,37 @@ async def get_current_user(
             detail="Invalid or expired token"
         )
 
-    user = await CRUD.get_user_by_email(db, email=email)
+    async with async_session() as db:
+        user = await CRUD.get_user_by_email(db, email=email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+
+    snapshot = schemas.User.model_validate(user)
+    security.cache_principal(token, payload, snapshot)
+    return snapshot
+
+# ==========================================================
+# CLIENT DISCONNECT
+# ==========================================================
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def cancel_on_disconnect(request: Request, coro):
+    """
+    Runs a long upstream call (e.g. Gemini) and cancels it
+    as soon as the client goes away, instead of finishing work nobody will read.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
 
 # ==========================================================
 # HEALTH + ROOT
@@ -115,12 +255,37 @@ def health():
         "version": API_VERSION
     }
 
+@app.get("/api/cache/stats", tags=["system"])
+def cache_stats():
+    return {
+        "geocode": services.geocode_cache_stats(),
+        "places": services.places_cache.stats(),
+        "itinerary": services.itinerary_cache_stats(),
+        "auth": security.auth_cache_stats(),
+        "upstream_quota": scheduler.stats(),
+        "upstream_health": resilience.stats(),
+        "poi_index": poi_index.poi_index.stats(),
+        "photos": photo_cache.photo_cache.stats(),
+        "itinerary_jobs": jobs.stats()
+    }
+
+@app.get("/api/startup", tags=["system"])
+def startup_report(top: int = Query(20, ge=1, le=200)):
+    """
+    How long this process took to start: each init step and the slowest imports.
+    """
+    return startup_profile.report(top)
+
+@app.get("/api/metrics", tags=["system"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/", tags=["system"])
-async def serve_frontend():
-    file_path = os.path.join(os.path.dirname(__file__), "index.html")
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    return {"message": "Dishanveshi API is running"}
+async def serve_frontend(request: Request):
+    asset = request.app.state.assets.get("/")
+    if asset is None:
+        return {"message": "Dishanveshi API is running"}
+    return static_assets.respond(request, asset)
 
 # ==========================================================
 # AUTH ROUTES
@@ -137,9 +302,11 @@ class LoginRequest(BaseModel):
     password: str
 
 @app.post("/api/auth/login", response_model=schemas.Token, tags=["auth"])
-async def login(req: LoginRequest):
-    # ===== DEMO LOGIN (SEMESTER PROJECT SAFE) =====
-    if req.email != "demo@dishanveshi.com" or req.password != "demo123":
+async def login(req: LoginRequest, db: AsyncDB):
+    user = await CRUD.get_user_by_email(db, email=req.email)
+    # Unknown emails still pay for one bcrypt verify, so timing doesn't reveal who is registered.
+    hashed = user.hashed_password if user else None
+    if not await security.verify_password_async(req.password, hashed) or not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
@@ -166,22 +333,73 @@ class LocationSearch(BaseModel):
 @app.post("/api/ai/recommend", tags=["ai"])
 async def ai_recommend(
     req: AIRequest,
+    request: Request,
     user = Depends(get_current_user)
 ):
-    advice = await services.get_ai_recommendation(
+    advice = await cancel_on_disconnect(request, services.get_ai_recommendation(
         req.mood, req.places_list
-    )
+    ))
     return {"recommendation": advice}
 
-@app.post("/api/places/search", tags=["places"])
+@app.post("/api/places/search", response_model=schemas.PlacesResponse, tags=["places"])
 async def search_places(
     search: LocationSearch,
     user = Depends(get_current_user)
 ):
     query = "restaurant" if search.type == "food" else "hotel"
-    return await services.get_google_places(
+    result = await services.get_google_places(
         search.lat, search.lng, query
     )
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+@app.get("/api/places/nearby", response_model=schemas.PlacesResponse, tags=["places"])
+async def nearby_places(
+    lat: float,
+    lng: float,
+    radius: float = Query(5000, gt=0, le=50000),
+    type: str | None = None,
+    min_rating: float | None = Query(None, ge=0, le=5),
+    k: int = Query(20, ge=1, le=100),
+    user = Depends(get_current_user)
+):
+    """
+    Nearest known places from the local POI index only (no Google call).
+    `type` is a Google place type ("restaurant", "lodging", ...) or one of our search words.
+    """
+    types = [poi_index.category_type(type)] if type else None
+    return {"places": poi_index.poi_index.query(lat, lng, radius, k, types, min_rating)}
+
+# Photos change URL when they change, so browsers and CDNs may keep them forever.
+PHOTO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/api/places/photo/{ref:path}", tags=["places"])
+async def place_photo(
+    ref: str,
+    request: Request,
+    max_width: int = Query(640, ge=1, le=4800)
+):
+    """
+    A place photo, `ref` being a photo name from a place record
+    (places/{place_id}/photos/{photo_id}), at most `max_width` pixels wide.
+    Served from the local photo cache; only its first request reaches Google.
+    No login needed, so it works in <img src>; only photos of places we have
+    returned ourselves are served.
+    """
+    match = photo_cache.PHOTO_NAME.fullmatch(ref)
+    if match is None or not places_client.was_served(match.group(1)):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    try:
+        photo = await photo_cache.photo_cache.get(ref, max_width)
+    except places_client.PlacesError as e:
+        raise HTTPException(status_code=404 if e.status_code in (400, 404) else 502, detail=str(e))
+
+    headers = {"ETag": photo.etag, "Cache-Control": PHOTO_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match", ""), (photo.etag,)):
+        return Response(status_code=304, headers=headers)
+    # streamed from disk in chunks
+    return FileResponse(photo.path, media_type=photo.content_type, headers=headers)
 
 # ==========================================================
 # ITINERARY
@@ -193,21 +411,100 @@ async def search_places(
 )
 async def generate_itinerary(
     req: schemas.ItineraryRequest,
+    request: Request,
     user = Depends(get_current_user)
 ):
-    plan = await services.generate_itinerary(
+    plan = await cancel_on_disconnect(request, services.generate_itinerary(
         destination=req.destination,
         days=req.days,
         travel_type=req.travel_type,
         budget=req.budget,
         mood=req.mood,
-        include_pois=req.include_pois
-    )
+        include_pois=req.include_pois,
+        fresh=req.fresh
+    ))
     return {
         "destination": req.destination,
         "plan": plan
     }
 
+def job_response(job, status_code: int = 200) -> RawJSONResponse:
+    # a finished job's result is stored as JSON and goes out as is
+    return RawJSONResponse(
+        {
+            "job_id": job.id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "error": job.error,
+        },
+        fragments={"result": job.result_json},
+        status_code=status_code,
+        headers={"Location": f"/api/itinerary/jobs/{job.id}"} if status_code == 202 else None,
+    )
+
+@app.post(
+    "/api/itinerary/jobs",
+    response_model=schemas.ItineraryJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["itinerary"]
+)
+async def submit_itinerary_job(
+    req: schemas.ItineraryRequest,
+    db: AsyncDB,
+    user = Depends(get_current_user)
+):
+    """
+    Job mode of /api/itinerary: answers at once with a job id, and a background
+    worker generates the plan. Poll GET /api/itinerary/jobs/{job_id} for it.
+    """
+    job = await jobs.submit(db, user.id, req.model_dump())
+    return job_response(job, status_code=status.HTTP_202_ACCEPTED)
+
+@app.get(
+    "/api/itinerary/jobs/{job_id}",
+    response_model=schemas.ItineraryJobStatus,
+    tags=["itinerary"]
+)
+async def get_itinerary_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish (long poll)"),
+    user = Depends(get_current_user)
+):
+    job = await jobs.wait(user.id, job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.post("/api/itinerary/stream", tags=["itinerary"])
+async def stream_itinerary(
+    req: schemas.ItineraryRequest,
+    user = Depends(get_current_user)
+):
+    """
+    Server-Sent Events version of /api/itinerary.
+    Sends a `day` event per parsed day, a `places` event when that day's POIs
+    are ready, and a final `done` (or `error`) event.
+    """
+    async def event_stream():
+        async for event, data in services.stream_itinerary(
+            destination=req.destination,
+            days=req.days,
+            travel_type=req.travel_type,
+            budget=req.budget,
+            mood=req.mood,
+            include_pois=req.include_pois,
+            fresh=req.fresh
+        ):
+            yield f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/itinerary/save", tags=["itinerary"])
 async def save_itinerary(
     req: schemas.ItinerarySaveRequest,
@@ -223,13 +520,100 @@ async def save_itinerary(
     )
     return {"message": "Itinerary saved", "id": saved.id}
 
+# Bulk import limits: items per request, and rows per INSERT statement.
+BULK_MAX_ITEMS = int(os.getenv("ITINERARY_BULK_MAX_ITEMS", "500"))
+BULK_BATCH_SIZE = int(os.getenv("ITINERARY_BULK_BATCH_SIZE", "100"))
+
+@app.post(
+    "/api/itinerary/bulk",
+    response_model=schemas.ItineraryBulkResponse,
+    tags=["itinerary"]
+)
+async def save_itineraries_bulk(
+    req: schemas.ItineraryBulkRequest,
+    db: AsyncDB,
+    user = Depends(get_current_user)
+):
+    if len(req.items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ITEMS} itineraries per request"
+        )
+
+    valid, positions, errors = [], [], []
+    for index, item in enumerate(req.items):
+        try:
+            item = schemas.ItinerarySaveRequest.model_validate(item)
+            # encoded one by one too, so a value JSON can't hold only rejects its own item
+            valid.append((item, CRUD.encode_plan(item.plan)))
+            positions.append(index)
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            errors.append({"index": index, "error": message})
+        except orjson.JSONEncodeError as e:
+            errors.append({"index": index, "error": f"plan: {e}"})
+
+    ids = [None] * len(req.items)
+    if valid:
+        new_ids = await CRUD.save_itineraries_bulk(db, user.id, valid, batch_size=BULK_BATCH_SIZE)
+        for index, new_id in zip(positions, new_ids):
+            ids[index] = new_id
+
+    return {"ids": ids, "created": len(valid), "errors": errors}
+
 @app.get(
     "/api/itinerary/my",
-    response_model=List[schemas.ItineraryDB],
+    response_model=schemas.ItineraryPage,
     tags=["itinerary"]
 )
 async def my_itineraries(
+    db: AsyncDB,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    user = Depends(get_current_user)
+):
+    try:
+        rows, next_cursor = await CRUD.get_user_itineraries(db, user.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": rows, "next_cursor": next_cursor}
+
+@app.get(
+    "/api/itinerary/{itinerary_id}",
+    response_model=schemas.ItineraryDB,
+    tags=["itinerary"]
+)
+async def get_itinerary(
+    itinerary_id: int,
     db: AsyncDB,
     user = Depends(get_current_user)
 ):
-    return await CRUD.get_user_itineraries(db, user.id)
+    itinerary = await CRUD.get_itinerary(db, user.id, itinerary_id)
+    if not itinerary:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    # the stored plan is already JSON: copy it into the response instead of decoding and re-encoding it
+    return RawJSONResponse(
+        {
+            "id": itinerary.id,
+            "destination": itinerary.destination,
+            "days": itinerary.days,
+            "created_at": itinerary.created_at,
+        },
+        fragments={"plan": itinerary.plan_json},
+    )
+
+# ==========================================================
+# FRONTEND ASSETS
+# ==========================================================
+# Registered last, so it never shadows an API route.
+@app.get("/{asset_name}", include_in_schema=False)
+async def serve_asset(asset_name: str, request: Request):
+    asset = request.app.state.assets.get("/" + asset_name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return static_assets.respond(request, asset)
+
+
+startup_profile.mark("import main (modules, routes)")
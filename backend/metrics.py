@@ -0,0 +1,219 @@
+import os
+import time
+from bisect import bisect_left
+
+# --- Configuration ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from fast cache hits up to slow Gemini calls.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter keyed by a tuple of label values.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, k)} {v:g}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. observe() is one bisect and two additions,
+    so it is cheap enough to call on every request.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Gauge whose value is read from a callback at scrape time,
+    so nothing is recorded on the hot path. The callback returns
+    a number, or a dict of {label values tuple: number}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self._read = read
+
+    def render(self) -> list[str]:
+        try:
+            value = self._read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.label_names, k)} {v:g}" for k, v in value.items()]
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        samples = metric.render()
+        if samples:
+            lines.extend(metric.header())
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Inbound requests ----------------
+
+http_requests = Counter(
+    "dishanveshi_http_requests_total", "HTTP requests handled, by route, method and status.",
+    ("method", "route", "status"),
+)
+http_latency = Histogram(
+    "dishanveshi_http_request_duration_seconds", "Time to send the full response, by route.",
+    ("method", "route"),
+)
+http_in_progress = 0
+Gauge("dishanveshi_http_requests_in_progress", "HTTP requests currently being handled.", lambda: http_in_progress)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware recording latency and status per route template
+    (e.g. /api/itinerary/{itinerary_id}), so ids don't blow up the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        global http_in_progress
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_progress -= 1
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_latency.observe(time.perf_counter() - start, method, path)
+            http_requests.inc(method, path, str(status_code))
+
+
+# ---------------- Upstream calls ----------------
+
+upstream_requests = Counter(
+    "dishanveshi_upstream_requests_total", "Calls to external APIs, by API and outcome.",
+    ("api", "outcome"),
+)
+upstream_latency = Histogram(
+    "dishanveshi_upstream_request_duration_seconds", "Latency of calls to external APIs.",
+    ("api",),
+)
+upstream_bytes = Counter(
+    "dishanveshi_upstream_response_bytes_total", "Response bytes received from external APIs.",
+    ("api",),
+)
+
+
+def record_upstream(api: str, seconds: float, outcome: str, nbytes: int = 0):
+    """
+    Records one external call. outcome is "ok", "error" (4xx/5xx),
+    "failed" (timeout, connection error, exception) or "cancelled"
+    (the caller went away first).
+    """
+    if not METRICS_ENABLED:
+        return
+    upstream_latency.observe(seconds, api)
+    upstream_requests.inc(api, outcome)
+    if nbytes:
+        upstream_bytes.inc(api, amount=nbytes)
+
+
+def api_label(upstream: str, path: str) -> str:
+    """
+    Short API name from an outbound request path, e.g.
+    /maps/api/place/details/json -> maps.place.details,
+    /v1/places:searchText -> places.searchText.
+    Any other path is "{upstream}.other": paths can hold ids and tokens,
+    and every distinct label is a series that lives forever. Callers that
+    know better pass the name themselves (see http_client).
+    """
+    if path.startswith("/maps/api/"):
+        parts = [p for p in path[len("/maps/api/"):].split("/") if p and p != "json"]
+        return "maps." + ".".join(parts)
+    last = path.rstrip("/").rsplit("/", 1)[-1]
+    return f"{upstream}.{last.split(':')[-1]}" if ":" in last else f"{upstream}.other"
@@ -0,0 +1,206 @@
+"""
+Versioned schema migrations.
+
+Each migration is a (version, description, upgrade) entry in MIGRATIONS;
+upgrade gets a synchronous SQLAlchemy connection inside a transaction that
+also records the version in schema_migrations. Migrations are append-only:
+never edit one that has shipped, add the next version instead, and write it
+as explicit DDL rather than from models.py (which describes only the latest schema).
+
+On startup the app checks the recorded version (one query) and refuses to
+start on an out-of-date database, except a local SQLite one, which it upgrades
+(DB_AUTO_MIGRATE, see settings.py). Apply migrations with:
+    python migrations.py upgrade
+    python migrations.py status
+"""
+import sys
+import json
+import asyncio
+from datetime import datetime
+
+import orjson
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, ForeignKey, DateTime, Text, Float, Index, inspect, select, func,
+    table, column, update
+)
+
+from database import engine
+from settings import settings
+
+VERSION_TABLE = "schema_migrations"
+
+_versions = MetaData()
+schema_migrations = Table(
+    VERSION_TABLE, _versions,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class SchemaOutOfDate(Exception):
+    """
+    Raised at startup when the database is behind the code's schema version.
+    """
+    pass
+
+
+def _baseline(conn):
+    # The schema as Base.metadata.create_all built it before migrations existed.
+    # Existing databases already have some or all of it: only what's missing is created.
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("id", Integer, primary_key=True, index=True, nullable=False),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("hashed_password", String, nullable=False),
+    )
+    Table(
+        "itineraries", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id")),
+        Column("destination", String, index=True),
+        Column("days", Integer),
+        Column("plan_json", Text),
+        Column("created_at", DateTime),
+        Index("ix_itineraries_user_created", "user_id", "created_at"),
+    )
+    Table(
+        "geocode_cache", metadata,
+        Column("query", String, primary_key=True),
+        Column("lat", Float, nullable=False),
+        Column("lng", Float, nullable=False),
+        Column("updated_at", DateTime),
+    )
+    Table(
+        "itinerary_jobs", metadata,
+        Column("id", String, primary_key=True),
+        Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+        Column("status", String, nullable=False),
+        Column("request_json", Text, nullable=False),
+        Column("result_json", Text),
+        Column("error", Text),
+        Column("attempts", Integer, nullable=False),
+        Column("created_at", DateTime),
+        Column("started_at", DateTime),
+        Column("finished_at", DateTime),
+        Index("ix_itinerary_jobs_status_created", "status", "created_at"),
+        Index("ix_itinerary_jobs_user_status", "user_id", "status"),
+    )
+    metadata.create_all(conn, checkfirst=True)
+    # create_all skips tables that exist; indexes added to them later may not
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _strict_plan_json(conn):
+    # Plans saved with json.dumps (before orjson) may hold NaN/Infinity, which
+    # isn't JSON. Stored plans go out as they are, so those rows are rewritten
+    # once here, with orjson, which turns them into null.
+    itineraries = table("itineraries", column("id", Integer), column("plan_json", Text))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(itineraries.c.id, itineraries.c.plan_json)
+            .where(itineraries.c.id > last_id)
+            .order_by(itineraries.c.id)
+            .limit(500)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        for row in rows:
+            if row.plan_json is None:
+                continue
+            try:
+                orjson.loads(row.plan_json)
+            except orjson.JSONDecodeError:
+                try:
+                    plan = json.loads(row.plan_json)
+                except ValueError:
+                    continue  # not something this app wrote; leave it alone
+                conn.execute(
+                    update(itineraries).where(itineraries.c.id == row.id)
+                    .values(plan_json=orjson.dumps(plan).decode())
+                )
+
+
+MIGRATIONS = [
+    (1, "baseline: users, itineraries, geocode_cache, itinerary_jobs", _baseline),
+    (2, "itineraries.plan_json: rewrite NaN/Infinity plans as strict JSON", _strict_plan_json),
+]
+LATEST = MIGRATIONS[-1][0]
+
+
+def _current_version(conn) -> int:
+    if not inspect(conn).has_table(VERSION_TABLE):
+        return 0
+    return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+async def current_version(db_engine=engine) -> int:
+    """
+    The highest migration applied to the database, 0 if none.
+    """
+    async with db_engine.connect() as conn:
+        return await conn.run_sync(_current_version)
+
+
+async def upgrade(db_engine=engine) -> list[int]:
+    """
+    Applies every pending migration in order, each in its own transaction,
+    and returns the versions applied.
+    """
+    applied = []
+    async with db_engine.begin() as conn:
+        await conn.run_sync(lambda c: _versions.create_all(c, checkfirst=True))
+    for version, description, migrate in MIGRATIONS:
+        async with db_engine.begin() as conn:
+            if await conn.run_sync(_current_version) >= version:
+                continue
+            await conn.run_sync(migrate)
+            await conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+
+async def check(db_engine=engine) -> int:
+    """
+    Called at startup. Returns the schema version, or raises SchemaOutOfDate
+    if migrations are pending (unless DB_AUTO_MIGRATE is set, then applies them).
+    """
+    version = await current_version(db_engine)
+    if version < LATEST:
+        if not settings.db_auto_migrate:
+            raise SchemaOutOfDate(
+                f"Database schema is at version {version}, this code needs {LATEST}. "
+                f"Run `python migrations.py upgrade` (or set DB_AUTO_MIGRATE=true)."
+            )
+        await upgrade(db_engine)
+        version = LATEST
+    elif version > LATEST:
+        print(f"⚠️ Database schema version {version} is newer than this code ({LATEST})")
+    return version
+
+
+async def _main(command: str):
+    try:
+        if command == "upgrade":
+            applied = await upgrade()
+            print(f"Applied migrations {applied}" if applied else "Already up to date")
+        elif command == "status":
+            version = await current_version()
+            print(f"Database at version {version}, latest is {LATEST}")
+            for number, description, _ in MIGRATIONS:
+                print(f"  {'✔' if number <= version else ' '} {number:04d} {description}")
+        else:
+            sys.exit(f"Unknown command {command!r}: use upgrade or status")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "status"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -25,7 +25,50 @@ class Itinerary(Base):
 
     user = relationship("User")
 
+    # Serves the "my itineraries" listing: filter by user, newest first.
+    __table_args__ = (
+        Index("ix_itineraries_user_created", "user_id", "created_at"),
+    )
+
     # We can add more fields here later, like:
     # is_active = Column(Boolean, default=True)
     # first_name = Column(String, index=True)
-    # last_name = Column(String, index=True)
\ No newline at end of file
+    # last_name = Column(String, index=True)
+
+
+class GeocodeCache(Base):
+    """
+    Persistent tier of the geocode cache, shared by all workers.
+    The key is the normalized destination string.
+    """
+    __tablename__ = "geocode_cache"
+
+    query = Column(String, primary_key=True)
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ItineraryJob(Base):
+    """
+    One queued itinerary generation (see jobs.py).
+    The table is the queue: workers claim the oldest queued row.
+    """
+    __tablename__ = "itinerary_jobs"
+
+    id = Column(String, primary_key=True)  # random hex, safe to show to clients
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    request_json = Column(Text, nullable=False)
+    result_json = Column(Text)  # {"destination": ..., "plan": [...]} once done
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)   # last claim; a running job older than the lease is reclaimed
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # workers claim by (status, created_at); per-user limits count by (user_id, status)
+        Index("ix_itinerary_jobs_status_created", "status", "created_at"),
+        Index("ix_itinerary_jobs_user_status", "user_id", "status"),
+    )
@@ -0,0 +1,175 @@
+import os
+import re
+import time
+import asyncio
+import bisect
+import hashlib
+import mimetypes
+from collections import OrderedDict
+
+import places_client
+from cache import SingleFlight
+
+# --- Configuration ---
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", "./photo_cache")
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Widths we actually fetch. A requested max width is rounded down to the largest
+# one that fits (the smallest if none does), so a few variants per photo serve
+# every screen instead of one per pixel width.
+# A hit updates the file's mtime (the LRU order across restarts) at most this often.
+PHOTO_TOUCH_INTERVAL_SECONDS = float(os.getenv("PHOTO_TOUCH_INTERVAL_SECONDS", "600"))
+PHOTO_WIDTHS = sorted(int(w) for w in os.getenv("PHOTO_WIDTHS", "160,320,640,1280,1600").split(","))
+
+# Photo names as Places API (New) returns them: places/{place_id}/photos/{photo_id}
+PHOTO_NAME = re.compile(r"places/([A-Za-z0-9_-]+)/photos/[A-Za-z0-9_-]+")
+
+
+def variant_width(max_width: int) -> int:
+    i = bisect.bisect_right(PHOTO_WIDTHS, max_width)
+    return PHOTO_WIDTHS[max(i - 1, 0)]
+
+
+class CachedPhoto:
+    __slots__ = ("path", "size", "etag", "content_type", "touched")
+
+    def __init__(self, path: str, size: int, etag: str, content_type: str):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.content_type = content_type
+        self.touched = time.monotonic()
+
+
+class PhotoCache:
+    """
+    Place photos on disk, one file per (photo, width) variant, evicting the
+    least recently used files once the total passes max_bytes.
+
+    Files are named {key}.{sha256}{ext}, so the index (and each strong ETag)
+    is rebuilt from a directory listing at startup; file mtimes keep the LRU
+    order across restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[str, CachedPhoto] = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(name: str, width: int) -> str:
+        return hashlib.sha256(f"{name}|{width}".encode()).hexdigest()[:32]
+
+    def load(self):
+        """
+        Indexes the files already in the cache directory, oldest first,
+        and removes downloads that never finished.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                os.remove(entry.path)
+                continue
+            key, _, rest = entry.name.partition(".")
+            digest, ext = os.path.splitext(rest)
+            st = entry.stat()
+            content_type = mimetypes.types_map.get(ext, "application/octet-stream")
+            found.append((st.st_mtime, key, CachedPhoto(entry.path, st.st_size, f'"{digest}"', content_type)))
+        self._entries.clear()
+        self.bytes = 0
+        for _, key, photo in sorted(found, key=lambda f: f[0]):
+            self._entries[key] = photo
+            self.bytes += photo.size
+        _remove(self._evict())
+
+    def _evict(self) -> list:
+        """
+        Drops the least recently used entries past max_bytes from the index
+        and returns their paths; the caller removes the files.
+        """
+        paths = []
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, photo = self._entries.popitem(last=False)
+            self.bytes -= photo.size
+            self.evictions += 1
+            paths.append(photo.path)
+        return paths
+
+    async def get(self, name: str, max_width: int) -> CachedPhoto:
+        """
+        The cached variant of photo `name` for `max_width`, downloading it
+        first if needed. Concurrent requests for a missing variant share one download.
+        """
+        width = variant_width(max_width)
+        key = self._key(name, width)
+        photo = self._entries.get(key)
+        if photo is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            now = time.monotonic()
+            if now - photo.touched < PHOTO_TOUCH_INTERVAL_SECONDS:
+                return photo
+            photo.touched = now
+            try:
+                # remember recency across restarts; a syscall, so not on the event loop
+                await asyncio.to_thread(os.utime, photo.path)
+                return photo
+            except FileNotFoundError:
+                # removed behind our back: forget it and download again
+                if self._entries.get(key) is photo:
+                    del self._entries[key]
+                    self.bytes -= photo.size
+        self.misses += 1
+        return await self._flights.do(key, lambda: self._download(key, name, width))
+
+    async def _download(self, key: str, name: str, width: int) -> CachedPhoto:
+        # file system work runs in a thread, off the event loop
+        await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+        tmp = os.path.join(self.directory, key + ".tmp")
+        try:
+            written = await places_client.download_photo(name, width, tmp)
+            ext = mimetypes.guess_extension(written["content_type"]) or ".bin"
+            digest = written["sha256"][:32]
+            path = os.path.join(self.directory, f"{key}.{digest}{ext}")
+            await asyncio.to_thread(os.replace, tmp, path)
+        except BaseException:
+            # may run while cancelled, so this one stays synchronous
+            _remove([tmp])
+            raise
+
+        photo = CachedPhoto(path, written["size"], f'"{digest}"', written["content_type"])
+        self._entries[key] = photo
+        self.bytes += photo.size
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(_remove, evicted)
+        return photo
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "files": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "downloads": self._flights.stats(),
+        }
+
+
+def _remove(paths: list):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+photo_cache = PhotoCache(PHOTO_CACHE_DIR, PHOTO_CACHE_MAX_BYTES)
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+# Geohash precision 6 is a cell of roughly 1.2 km x 0.6 km, small next to the
+# 5 km search radius, so everyone inside a cell can share one result.
+PLACES_CACHE_PRECISION = int(os.getenv("PLACES_CACHE_PRECISION", "6"))
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL", "3600"))
+# After the TTL an entry is still served for this long while it is refreshed in the background.
+PLACES_CACHE_STALE_TTL = float(os.getenv("PLACES_CACHE_STALE_TTL", "21600"))
+PLACES_CACHE_MAX_BYTES = int(os.getenv("PLACES_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = PLACES_CACHE_PRECISION) -> str:
+    """
+    Encodes a coordinate as a geohash string of the given length.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> tuple[float, float]:
+    """
+    Returns the (lat, lng) center of a geohash cell.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for ch in cell:
+        idx = _BASE32.index(ch)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (idx >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+class PlacesCache:
+    """
+    Places results keyed by (endpoint, query, geohash cell, radius).
+    Entries are fresh for `ttl`, then served stale for `stale_ttl` while one
+    background task refreshes them. Past that they are only used as a fallback
+    when the upstream call fails. Total size is capped in bytes (LRU eviction).
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_bytes: int, precision: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self.bytes = 0
+        self._data: OrderedDict = OrderedDict()  # key -> (fresh_until, stale_until, size, value)
+        self._refreshing: dict = {}
+        self._stats: dict[str, dict] = {}
+
+    def _count(self, endpoint: str, field: str):
+        stats = self._stats.setdefault(endpoint, {"hits": 0, "stale_hits": 0, "misses": 0, "fallbacks": 0})
+        stats[field] += 1
+
+    def _store(self, key, value):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        now = time.monotonic()
+        self._data[key] = (now + self.ttl, now + self.ttl + self.stale_ttl, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.bytes -= evicted[2]
+
+    async def _refresh(self, key, fetch, lat: float, lng: float):
+        try:
+            value = await fetch(lat, lng)
+            if _cacheable(value):
+                self._store(key, value)
+        except Exception:
+            pass
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_fetch(self, endpoint: str, query: str, lat: float, lng: float, radius: float, fetch):
+        """
+        Returns a cached result for the cell containing (lat, lng), or calls
+        `fetch(cell_lat, cell_lng)` with the cell center and caches what it returns.
+        """
+        cell = geohash_encode(lat, lng, self.precision)
+        key = (endpoint, query.strip().casefold(), cell, int(radius))
+        cell_lat, cell_lng = geohash_center(cell)
+        now = time.monotonic()
+
+        item = self._data.get(key)
+        expired = None
+        if item is not None:
+            fresh_until, stale_until, _, value = item
+            if now < fresh_until:
+                self._data.move_to_end(key)
+                self._count(endpoint, "hits")
+                return value
+            if now < stale_until:
+                self._data.move_to_end(key)
+                self._count(endpoint, "stale_hits")
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(
+                        self._refresh(key, fetch, cell_lat, cell_lng)
+                    )
+                return value
+            expired = value
+
+        self._count(endpoint, "misses")
+        try:
+            value = await fetch(cell_lat, cell_lng)
+        except Exception:
+            if expired is None:
+                raise
+            value = None
+        if _cacheable(value) and value is not None:
+            self._store(key, value)
+            return value
+        if expired is not None:
+            # stale-if-error: an old answer beats an error page
+            self._count(endpoint, "fallbacks")
+            return expired
+        return value
+
+    def stats(self) -> dict:
+        endpoints = {}
+        for endpoint, counts in self._stats.items():
+            total = counts["hits"] + counts["stale_hits"] + counts["misses"]
+            served = counts["hits"] + counts["stale_hits"]
+            endpoints[endpoint] = dict(counts, hit_ratio=round(served / total, 4) if total else 0.0)
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "endpoints": endpoints,
+        }
+
+
+def _cacheable(value) -> bool:
+    # never cache error payloads like {"error": "..."}
+    return not (isinstance(value, dict) and "error" in value)
+
+
+places_cache = PlacesCache(
+    ttl=PLACES_CACHE_TTL,
+    stale_ttl=PLACES_CACHE_STALE_TTL,
+    max_bytes=PLACES_CACHE_MAX_BYTES,
+    precision=PLACES_CACHE_PRECISION,
+)
@@ -0,0 +1,193 @@
+import os
+import asyncio
+import hashlib
+
+import http_client
+import resilience
+import scheduler
+from cache import TTLCache
+from poi_index import poi_index, POI_INDEX_ENABLED
+from settings import settings
+
+# --- Configuration ---
+GOOGLE_MAPS_API_KEY = settings.google_maps_api_key
+PLACES_PAGE_SIZE = int(os.getenv("PLACES_PAGE_SIZE", "20"))   # Text Search returns at most 20 per page
+PLACES_MAX_PHOTOS = int(os.getenv("PLACES_MAX_PHOTOS", "3"))  # photo references kept per place
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))  # refuse bigger downloads
+# With the POI index off, the place ids we have returned are remembered here
+# instead, so the photo proxy only fetches photos of places we served.
+SERVED_PLACES_SIZE = int(os.getenv("SERVED_PLACES_SIZE", "200000"))
+SERVED_PLACES_TTL = float(os.getenv("SERVED_PLACES_TTL", str(7 * 24 * 3600)))
+
+# Everything a place record needs, asked for in the one Text Search call.
+# Website and opening hours bill at a higher SKU, but still cost less
+# than the Place Details call per result they replace.
+FIELD_MASK = ",".join("places." + field for field in (
+    "id",
+    "displayName",
+    "formattedAddress",
+    "location",
+    "rating",
+    "userRatingCount",
+    "types",
+    "websiteUri",
+    "regularOpeningHours",
+    "photos",
+))
+
+_served = TTLCache(SERVED_PLACES_SIZE, SERVED_PLACES_TTL)
+
+
+class PlacesError(Exception):
+    """
+    Raised when Places API answers with an error status.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"Google API Error ({status_code}): {detail}")
+        self.status_code = status_code
+
+
+def to_place(place: dict) -> dict | None:
+    """
+    Normalizes one Places API (New) result to our compact place record
+    (see schemas.Place). Returns None for results without a location.
+    """
+    location = place.get("location") or {}
+    if "latitude" not in location or "longitude" not in location:
+        return None
+    hours = place.get("regularOpeningHours") or {}
+    return {
+        "place_id": place.get("id"),
+        "name": (place.get("displayName") or {}).get("text"),
+        "address": place.get("formattedAddress"),
+        "lat": location["latitude"],
+        "lng": location["longitude"],
+        "rating": place.get("rating"),
+        "reviews": place.get("userRatingCount"),
+        "types": place.get("types", []),
+        "website": place.get("websiteUri"),
+        "open_now": hours.get("openNow"),
+        "hours": hours.get("weekdayDescriptions", []),
+        "photos": [
+            {
+                "name": photo["name"],
+                "width": photo.get("widthPx"),
+                "height": photo.get("heightPx"),
+                "attributions": [a.get("displayName") for a in photo.get("authorAttributions", [])],
+            }
+            for photo in place.get("photos", [])[:PLACES_MAX_PHOTOS] if photo.get("name")
+        ],
+    }
+
+
+async def search_text(query: str, lat: float, lng: float, radius: float = 5000) -> list[dict]:
+    """
+    One field-masked Text Search around (lat, lng).
+    Returns every result as a place record and adds them to the POI index.
+    Raises PlacesError on an error answer (and CircuitOpen / UpstreamBusy
+    from the resilience and quota layers).
+    """
+    if not GOOGLE_MAPS_API_KEY:
+        raise PlacesError(401, "Google Maps API Key missing")
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": GOOGLE_MAPS_API_KEY,
+        "X-Goog-FieldMask": FIELD_MASK,
+    }
+    payload = {
+        "textQuery": query,
+        "pageSize": PLACES_PAGE_SIZE,
+        "locationBias": {
+            "circle": {
+                "center": {"latitude": lat, "longitude": lng},
+                "radius": float(radius)
+            }
+        }
+    }
+
+    client = http_client.get_client("places")
+    response = await resilience.call(
+        "places.searchText",
+        lambda: scheduler.call("places", lambda: client.post("/v1/places:searchText", json=payload, headers=headers))
+    )
+    if response.status_code != 200:
+        raise PlacesError(response.status_code, response.text)
+
+    places = [p for p in map(to_place, response.json().get("places", [])) if p]
+    if POI_INDEX_ENABLED:
+        poi_index.add_many(places, query, lat, lng)
+    else:
+        for place in places:
+            _served.set(place["place_id"], True)
+    return places
+
+
+def was_served(place_id: str) -> bool:
+    """
+    Whether a place with this id has come out of one of our searches
+    (it is in the POI index, or was returned within SERVED_PLACES_TTL).
+    """
+    if POI_INDEX_ENABLED:
+        return poi_index.has(place_id)
+    return place_id in _served
+
+
+async def download_photo(name: str, max_width: int, path: str) -> dict:
+    """
+    Streams one place photo (`name` as in a place record's photos), resized by
+    Google to at most `max_width` pixels, into the file at `path`.
+    Returns {"content_type", "size", "sha256"} of what was written.
+    Raises PlacesError on an error answer or a body over `PHOTO_MAX_BYTES`.
+    """
+    if not GOOGLE_MAPS_API_KEY:
+        raise PlacesError(401, "Google Maps API Key missing")
+
+    params = {"maxWidthPx": max_width, "key": GOOGLE_MAPS_API_KEY}
+    client = http_client.get_client("places")
+    written = {}
+
+    async def download():
+        # the media endpoint redirects to the image itself
+        # every hop, the redirect to the image host included, is recorded as places.media
+        async with client.stream(
+            "GET", f"/v1/{name}/media", params=params, follow_redirects=True, extensions={"api": "places.media"}
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response
+            digest, size = hashlib.sha256(), 0
+            # file writes run in a thread, off the event loop; unbuffered, so close() doesn't write
+            f = await asyncio.to_thread(open, path, "wb", buffering=0)
+            writing = None
+            try:
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > PHOTO_MAX_BYTES:
+                        raise PlacesError(413, f"photo larger than {PHOTO_MAX_BYTES} bytes")
+                    digest.update(chunk)
+                    writing = asyncio.ensure_future(asyncio.to_thread(f.write, chunk))
+                    await asyncio.shield(writing)
+            finally:
+                if writing is not None and not writing.done():
+                    # cancelled mid-write: close once the thread is done with the file
+                    writing.add_done_callback(lambda _: f.close())
+                else:
+                    f.close()
+            written.update(
+                content_type=response.headers.get("content-type", "image/jpeg").split(";")[0],
+                size=size,
+                sha256=digest.hexdigest(),
+            )
+            return response
+
+    # no hedging: a duplicate download would double the bytes and share the file
+    response = await resilience.call(
+        "places.media",
+        lambda: scheduler.call("places", download),
+        hedge=False
+    )
+    if response.status_code != 200:
+        raise PlacesError(response.status_code, response.text)
+    return written
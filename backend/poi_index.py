@@ -0,0 +1,320 @@
+import os
+import json
+import asyncio
+import math
+import time
+import numpy as np
+
+from places_cache import geohash_encode
+
+# --- Configuration ---
+POI_INDEX_ENABLED = os.getenv("POI_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+POI_INDEX_PATH = os.getenv("POI_INDEX_PATH", "./poi_index.npz")
+# Grid cell size in degrees (0.01 is about 1.1 km north-south).
+POI_CELL_DEGREES = float(os.getenv("POI_CELL_DEGREES", "0.01"))
+# An area counts as covered for a category once Google was asked about it
+# within POI_COVERAGE_TTL_DAYS; areas are geohash cells of this precision (5 is ~5 km).
+POI_COVERAGE_PRECISION = int(os.getenv("POI_COVERAGE_PRECISION", "5"))
+POI_COVERAGE_TTL_DAYS = float(os.getenv("POI_COVERAGE_TTL_DAYS", "30"))
+# ...and it also needs at least this many matching POIs to answer without Google.
+POI_MIN_RESULTS = int(os.getenv("POI_MIN_RESULTS", "5"))
+POI_SAVE_INTERVAL_SECONDS = float(os.getenv("POI_SAVE_INTERVAL_SECONDS", "300"))
+
+EARTH_RADIUS_M = 6371008.8
+# Bumped when the stored record shape changes; an older file is ignored and rebuilt.
+POI_INDEX_FORMAT = 2
+# Our search words -> the Google place type they correspond to.
+CATEGORY_TYPES = {
+    "restaurant": "restaurant",
+    "hotel": "lodging",
+    "tourist attraction": "tourist_attraction",
+}
+
+
+def category_type(query: str) -> str:
+    query = query.strip().casefold()
+    return CATEGORY_TYPES.get(query, query.replace(" ", "_"))
+
+
+class POIIndex:
+    """
+    Every POI we have fetched, with a grid index for radius and k-nearest search.
+
+    Coordinates, ratings and type bitmasks live in NumPy arrays so a query
+    filters all candidates of the touched cells in one vectorized pass;
+    the full records are only decoded for the results.
+    """
+
+    def __init__(self, path: str, cell_degrees: float):
+        self.path = path
+        self.cell_degrees = cell_degrees
+        self.size = 0
+        self.lat = np.empty(0, dtype=np.float64)
+        self.lng = np.empty(0, dtype=np.float64)
+        self.rating = np.empty(0, dtype=np.float32)   # NaN when unrated
+        self.types = np.zeros((0, 1), dtype=np.uint64)  # bit per entry of _type_bits, 64 per column
+        self._records: list = []                      # JSON bytes until first read, then dict
+        self._ids: dict[str, int] = {}
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        # our categories come first, so they always share the first column
+        self._type_bits: dict[str, int] = {t: bit for bit, t in enumerate(CATEGORY_TYPES.values())}
+        self._coverage: dict[str, float] = {}         # "type|geohash" -> last fetched (epoch)
+        self.dirty = False
+        self.queries = 0
+        self.answered = 0
+
+    # ---------------- building ----------------
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _words(self, types, learn: bool = False) -> dict[int, int]:
+        """
+        The type bitmask of `types` as {column: 64-bit word}. With learn=True,
+        types seen for the first time get the next free bit (adding a column
+        every 64 types); otherwise unknown types are left out.
+        """
+        words: dict[int, int] = {}
+        for t in types:
+            bit = self._type_bits.get(t)
+            if bit is None:
+                if not learn:
+                    continue
+                bit = self._type_bits[t] = len(self._type_bits)
+                if bit // 64 >= self.types.shape[1]:
+                    self.types = np.hstack((self.types, np.zeros((len(self.types), 1), dtype=np.uint64)))
+            words[bit // 64] = words.get(bit // 64, 0) | 1 << (bit % 64)
+        return words
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * len(self.lat), 1024)
+        for name in ("lat", "lng", "rating", "types"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, record: dict, category: str | None = None) -> bool:
+        """
+        Inserts or updates one POI (a place record, see places_client.to_place).
+        `category` is the search word it was found with, stored as a type too.
+        """
+        lat, lng = record.get("lat"), record.get("lng")
+        if lat is None or lng is None:
+            return False
+        types = list(record.get("types") or [])
+        if category and category_type(category) not in types:
+            types.append(category_type(category))
+        key = record.get("place_id") or f"{record.get('name')}@{lat:.5f},{lng:.5f}"
+        record = dict(record, types=types)
+
+        index = self._ids.get(key)
+        if index is None:
+            index = self.size
+            if index >= len(self.lat):
+                self._grow(index + 1)
+            self.size += 1
+            self._ids[key] = index
+            self._records.append(record)
+        else:
+            old_cell = self._cell(self.lat[index], self.lng[index])
+            self._cells[old_cell].remove(index)
+            old = self.record(index)
+            # keep types learned from other searches
+            record["types"] = list(dict.fromkeys(old.get("types", []) + types))
+            self._records[index] = record
+
+        self.lat[index] = lat
+        self.lng[index] = lng
+        self.rating[index] = record["rating"] if record.get("rating") is not None else np.nan
+        words = self._words(record["types"], learn=True)
+        self.types[index] = 0
+        for column, word in words.items():
+            self.types[index, column] = word
+        self._cells.setdefault(self._cell(lat, lng), []).append(index)
+        self.dirty = True
+        return True
+
+    def add_many(self, records, category: str, lat: float, lng: float) -> int:
+        """
+        Stores the results of one Google search around (lat, lng)
+        and marks that area as covered for the category.
+        """
+        added = sum(self.add(r, category) for r in records if r)
+        self._coverage[f"{category_type(category)}|{geohash_encode(lat, lng, POI_COVERAGE_PRECISION)}"] = time.time()
+        self.dirty = True
+        return added
+
+    def has(self, place_id: str) -> bool:
+        return place_id in self._ids
+
+    def record(self, index: int) -> dict:
+        record = self._records[index]
+        if isinstance(record, bytes):
+            record = self._records[index] = json.loads(record)
+        return record
+
+    # ---------------- queries ----------------
+
+    def is_covered(self, category: str, lat: float, lng: float) -> bool:
+        fetched = self._coverage.get(f"{category_type(category)}|{geohash_encode(lat, lng, POI_COVERAGE_PRECISION)}")
+        return fetched is not None and time.time() - fetched < POI_COVERAGE_TTL_DAYS * 86400
+
+    def _candidates(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        (x0, y0), (x1, y1) = self._cell(lat - dlat, lng - dlng), self._cell(lat + dlat, lng + dlng)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            # the box spans more cells than we have filled: scan the filled ones
+            cells = [idx for (x, y), idx in self._cells.items() if x0 <= x <= x1 and y0 <= y <= y1]
+        else:
+            cells = [self._cells[c] for c in
+                     ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)) if c in self._cells]
+        if not cells:
+            return np.empty(0, dtype=np.int64)
+        return np.fromiter((i for idx in cells for i in idx), dtype=np.int64)
+
+    def query(self, lat: float, lng: float, radius_m: float = 5000, k: int | None = None,
+              types=None, min_rating: float | None = None) -> list[dict]:
+        """
+        POIs within `radius_m` of (lat, lng), nearest first, optionally only
+        the `k` nearest, only those having any of `types`, and only those
+        rated at least `min_rating`. Each result carries `distance_m`.
+        """
+        idx = self._candidates(lat, lng, radius_m)
+        if types:
+            wanted = self._words(types)
+            if not wanted:
+                return []
+            match = np.zeros(len(idx), dtype=bool)
+            for column, word in wanted.items():
+                match |= (self.types[idx, column] & np.uint64(word)) != 0
+            idx = idx[match]
+        if min_rating is not None:
+            idx = idx[self.rating[idx] >= min_rating]  # NaN (unrated) never passes
+        if not len(idx):
+            return []
+
+        # haversine distance for the remaining candidates
+        lat1, lng1 = math.radians(lat), math.radians(lng)
+        lat2, lng2 = np.radians(self.lat[idx]), np.radians(self.lng[idx])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        dist = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+        inside = dist <= radius_m
+        idx, dist = idx[inside], dist[inside]
+
+        if k is not None and k < len(idx):
+            nearest = np.argpartition(dist, k)[:k]
+            idx, dist = idx[nearest], dist[nearest]
+        order = np.argsort(dist, kind="stable")
+        return [dict(self.record(int(i)), distance_m=round(float(d), 1)) for i, d in zip(idx[order], dist[order])]
+
+    def nearby_if_covered(self, category: str, lat: float, lng: float, radius_m: float = 5000,
+                          k: int | None = None, min_rating: float | None = None) -> list[dict] | None:
+        """
+        Answers a category search locally when the area was fetched recently
+        and has at least POI_MIN_RESULTS matches; otherwise returns None
+        and the caller should ask Google.
+        """
+        self.queries += 1
+        if not self.is_covered(category, lat, lng):
+            return None
+        results = self.query(lat, lng, radius_m, None, [category_type(category)], min_rating)
+        if len(results) < min(POI_MIN_RESULTS, k or POI_MIN_RESULTS):
+            return None
+        self.answered += 1
+        return results[:k] if k else results
+
+    def stats(self) -> dict:
+        return {
+            "pois": self.size,
+            "cells": len(self._cells),
+            "covered_areas": len(self._coverage),
+            "queries": self.queries,
+            "answered_locally": self.answered,
+        }
+
+    # ---------------- persistence ----------------
+
+    def snapshot(self) -> dict:
+        """
+        Copies what save() writes, so write() can run off the event loop.
+        Stored records are never mutated, so a shallow copy of the list is enough.
+        """
+        self.dirty = False
+        return {
+            "lat": self.lat[:self.size].copy(),
+            "lng": self.lng[:self.size].copy(),
+            "rating": self.rating[:self.size].copy(),
+            "types": self.types[:self.size].copy(),
+            "records": list(self._records),
+            "meta": {"format": POI_INDEX_FORMAT, "cell_degrees": self.cell_degrees, "type_bits": dict(self._type_bits),
+                     "coverage": dict(self._coverage), "ids": list(self._ids)},
+        }
+
+    def write(self, snapshot: dict):
+        """
+        Writes a snapshot as one .npz: the arrays, plus every record as JSON
+        in a single byte blob with offsets, so loading never parses them up front.
+        """
+        blobs = [r if isinstance(r, bytes) else json.dumps(r, separators=(",", ":")).encode()
+                 for r in snapshot["records"]]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        arrays = {name: snapshot[name] for name in ("lat", "lng", "rating", "types")}
+        arrays["offsets"] = offsets
+        arrays["records"] = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+        arrays["meta"] = np.frombuffer(json.dumps(snapshot["meta"]).encode(), dtype=np.uint8)
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path)
+
+    def save(self):
+        self.write(self.snapshot())
+
+    def load(self) -> bool:
+        """
+        Loads the index written by save(). Returns False if there is none
+        (or it was written in an older format).
+        """
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes())
+            if meta.get("format") != POI_INDEX_FORMAT:
+                return False
+            lat, lng, rating, types = data["lat"], data["lng"], data["rating"], data["types"]
+            offsets, blob = data["offsets"], data["records"].tobytes()
+
+        self.size = len(lat)
+        # files from before the mask could grow past 64 types hold its one column, flattened
+        self.lat, self.lng, self.rating, self.types = lat, lng, rating, types if types.ndim == 2 else types[:, None]
+        self._records = [blob[offsets[i]:offsets[i + 1]] for i in range(self.size)]
+        self._ids = {key: i for i, key in enumerate(meta["ids"])}
+        self._type_bits = meta["type_bits"]
+        self._coverage = meta["coverage"]
+        # the grid itself isn't stored: rebuilding it is one vectorized pass
+        self._cells = {}
+        cx = np.floor(lat / self.cell_degrees).astype(np.int64)
+        cy = np.floor(lng / self.cell_degrees).astype(np.int64)
+        for i, cell in enumerate(zip(cx.tolist(), cy.tolist())):
+            self._cells.setdefault(cell, []).append(i)
+        self.dirty = False
+        return True
+
+
+poi_index = POIIndex(POI_INDEX_PATH, POI_CELL_DEGREES)
+
+
+async def autosave():
+    """
+    Writes the index to disk every POI_SAVE_INTERVAL_SECONDS when it changed.
+    The snapshot is taken on the event loop, the file is written in a thread.
+    """
+    while True:
+        await asyncio.sleep(POI_SAVE_INTERVAL_SECONDS)
+        if poi_index.dirty:
+            snapshot = poi_index.snapshot()
+            await asyncio.to_thread(poi_index.write, snapshot)
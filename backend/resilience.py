@@ -0,0 +1,280 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+import metrics
+import scheduler
+
+# --- Configuration ---
+# Hedging: once an attempt has run longer than the API's recent p95,
+# a duplicate is sent and whichever answers first wins.
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))       # no hedging until p95 is meaningful
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "512"))                # latencies kept per API
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))        # at most 10% extra calls
+# Circuit breaker: open after too many failures among the last calls,
+# fail fast while open, then let one probe call through.
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+_hedges = metrics.Counter("dishanveshi_upstream_hedges_total", "Hedged duplicate requests sent.", ("api",))
+_hedge_wins = metrics.Counter("dishanveshi_upstream_hedge_wins_total", "Hedged requests that answered first.", ("api",))
+_hedge_saved = metrics.Counter(
+    "dishanveshi_upstream_hedge_saved_seconds_total", "Latency saved by hedged requests that won.", ("api",)
+)
+_short_circuits = metrics.Counter(
+    "dishanveshi_upstream_short_circuits_total", "Calls failed fast by an open circuit breaker.", ("api",)
+)
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+    def __init__(self, api: str):
+        super().__init__(f"{api} is temporarily unavailable")
+        self.api = api
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one API, with a p95 recomputed every few samples.
+    """
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+        self._p95 = None
+        self._stale = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self._stale += 1
+
+    def p95(self) -> float | None:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._p95 is None or self._stale >= 16:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[int(len(ordered) * 0.95)]
+            self._stale = 0
+        return self._p95
+
+
+class CircuitBreaker:
+    def __init__(self, api: str):
+        self.api = api
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.opens = 0
+        self._results = deque(maxlen=BREAKER_WINDOW)
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= BREAKER_COOLDOWN_SECONDS:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def end_probe(self):
+        """
+        Lets the next call probe again. For a probe that ended without a verdict
+        (cancelled, or turned away by our own quota queue); a no-op after record().
+        """
+        self._probing = False
+
+    def record(self, ok: bool):
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self.state = CLOSED
+                self._results.clear()
+            else:
+                self._open()
+            return
+        self._results.append(ok)
+        failures = self._results.count(False)
+        if (self.state == CLOSED and len(self._results) >= BREAKER_MIN_CALLS
+                and failures / len(self._results) >= BREAKER_FAILURE_RATIO):
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opens += 1
+
+
+class Upstream:
+    def __init__(self, api: str):
+        self.api = api
+        self.latency = LatencyTracker(HEDGE_WINDOW)
+        self.breaker = CircuitBreaker(api)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.saved_seconds = 0.0
+        self.short_circuited = 0
+
+    def stats(self) -> dict:
+        p95 = self.latency.p95()
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "short_circuited": self.short_circuited,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "saved_ms": round(self.saved_seconds * 1000, 1),
+        }
+
+
+_upstreams: dict[str, Upstream] = {}
+_background: set[asyncio.Task] = set()
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+metrics.Gauge(
+    "dishanveshi_upstream_breaker_state", "Circuit breaker state (0 closed, 1 half open, 2 open).",
+    lambda: {(api,): _STATE_VALUES[u.breaker.state] for api, u in _upstreams.items()}, ("api",),
+)
+
+
+def _upstream(api: str) -> Upstream:
+    upstream = _upstreams.get(api)
+    if upstream is None:
+        upstream = _upstreams[api] = Upstream(api)
+    return upstream
+
+
+def _ok(task: asyncio.Task) -> bool:
+    """
+    A finished attempt counts as healthy unless it raised or got a 429/5xx.
+    """
+    if task.cancelled() or task.exception() is not None:
+        return False
+    status = getattr(task.result(), "status_code", 200)
+    return status < 500 and status != 429
+
+
+async def call(api: str, fn, hedge: bool = True):
+    """
+    Runs `fn()` (a coroutine factory) for one upstream API, with
+    hedging (when `hedge` is set and the call is idempotent) and a
+    circuit breaker. Raises CircuitOpen while the API is failing.
+    """
+    upstream = _upstream(api)
+    if not upstream.breaker.allow():
+        upstream.short_circuited += 1
+        _short_circuits.inc(api)
+        raise CircuitOpen(api)
+    probe = upstream.breaker.state == HALF_OPEN
+    try:
+        return await _call(upstream, fn, hedge)
+    finally:
+        if probe:
+            # whatever happened, the half-open breaker must not wait on this call forever
+            upstream.breaker.end_probe()
+
+
+async def _call(upstream: Upstream, fn, hedge: bool):
+    api = upstream.api
+    loop = asyncio.get_running_loop()
+    upstream.calls += 1
+    finished_at = {}
+    timings = {}
+
+    async def attempt(name: str):
+        # scheduler.call fills this in: time spent in our own quota queue or
+        # retry backoff is not the upstream's latency, so it stays out
+        timing = timings[name]
+        scheduler.TIMING.set(timing)
+        t0 = timing["started"]
+        try:
+            return await fn()
+        except (scheduler.UpstreamBusy, asyncio.CancelledError):
+            # not an upstream answer: keep it out of the latency window
+            t0 = None
+            raise
+        finally:
+            finished_at[name] = loop.time()
+            if t0 is not None:
+                upstream.latency.record(timing.get("seconds", finished_at[name] - t0))
+
+    def launch(name: str) -> asyncio.Task:
+        timings[name] = {"started": loop.time()}
+        return asyncio.create_task(attempt(name))
+
+    tasks = [launch("primary")]
+    try:
+        delay = upstream.latency.p95() if hedge and HEDGE_ENABLED else None
+        if delay is not None and upstream.hedges < HEDGE_MAX_RATIO * upstream.calls:
+            delay = max(delay, HEDGE_MIN_DELAY)
+            while True:
+                # the delay runs from when the primary got its quota token: a call
+                # still waiting in our own queue isn't slow, and a hedge would only queue too
+                started = timings["primary"]["started"]
+                wait = delay if started is None else started + delay - loop.time()
+                done, _ = await asyncio.wait(tasks, timeout=max(wait, 0))
+                if done:
+                    break
+                started = timings["primary"]["started"]
+                if started is not None and loop.time() >= started + delay:
+                    upstream.hedges += 1
+                    _hedges.inc(api)
+                    tasks.append(launch("hedge"))
+                    break
+
+        winner, pending = None, set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in done if _ok(t)), None)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if winner is None:
+        winner = tasks[0]
+    elif winner is not tasks[0]:
+        upstream.hedge_wins += 1
+        _hedge_wins.inc(api)
+    # let the slower attempt finish: its latency keeps the p95 honest
+    # and tells us how much time the hedge saved
+    for task in pending:
+        _background.add(task)
+        task.add_done_callback(_forget)
+        if winner is not tasks[0]:
+            task.add_done_callback(lambda _t: _record_saving(upstream, finished_at))
+
+    error = None if winner.cancelled() else winner.exception()
+    if not isinstance(error, scheduler.UpstreamBusy):
+        # our own quota queue being full says nothing about the upstream's health
+        upstream.breaker.record(_ok(winner))
+    return winner.result()
+
+
+def _forget(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled():
+        task.exception()  # retrieved, so asyncio doesn't log it
+
+
+def _record_saving(upstream: Upstream, finished_at: dict):
+    if "primary" in finished_at and "hedge" in finished_at:
+        saved = max(0.0, finished_at["primary"] - finished_at["hedge"])
+        upstream.saved_seconds += saved
+        _hedge_saved.inc(upstream.api, amount=saved)
+
+
+def stats() -> dict:
+    return {api: u.stats() for api, u in _upstreams.items()}
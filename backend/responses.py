@@ -0,0 +1,151 @@
+import os
+import gzip
+import asyncio
+
+import brotli
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+# --- Configuration ---
+# Responses smaller than this go out uncompressed; it's not worth the CPU.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Bodies this big are compressed in a worker thread instead of on the event loop.
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(256 * 1024)))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))   # 0-11; 4 is about gzip's speed, but smaller
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+COMPRESSIBLE_TYPES = {"application/json", "text/plain", "text/html", "text/css", "application/javascript"}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    The default response class: orjson instead of the stdlib json module.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RawJSONResponse(JSONResponse):
+    """
+    A JSON object built from `content` plus `fragments`: fields whose values
+    are already serialized JSON (e.g. a plan as stored in the database).
+    The fragments are copied into the body as they are, never parsed or escaped again,
+    so they must be strict JSON (stored plans are: see CRUD.encode_plan and migration 2).
+    """
+
+    def __init__(self, content: dict, fragments: dict, **kwargs):
+        self.fragments = fragments
+        super().__init__(content, **kwargs)
+
+    def render(self, content: dict) -> bytes:
+        body = bytearray(orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)[:-1])  # drop the closing "}"
+        for name, raw in self.fragments.items():
+            if raw is None:
+                raw = b"null"
+            elif isinstance(raw, str):
+                raw = raw.encode()
+            if len(body) > 1:
+                body += b","
+            body += orjson.dumps(name) + b":" + raw
+        body += b"}"
+        return bytes(body)
+
+
+def choose_encoding(accept_encoding: str, available=("br", "gzip")) -> str | None:
+    """
+    The first of `available` (in our order of preference) that an
+    Accept-Encoding header allows, or None for the identity encoding.
+    """
+    offered = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    for encoding in available:
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match: str, etags) -> bool:
+    """
+    Whether an If-None-Match header names any of `etags` (or is "*").
+    Tags are compared whole, weakly (a W/ prefix is ignored), as RFC 9110 asks for GET.
+    """
+    sent = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in sent or not sent.isdisjoint(etags)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip (whichever the client prefers, brotli first) for complete
+    JSON/text responses of at least COMPRESSION_MIN_SIZE bytes.
+    Streamed responses (SSE, files) and already-encoded bodies pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if "content-encoding" in headers or media_type not in COMPRESSIBLE_TYPES:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            passthrough = True  # only the first body message is ever looked at
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body") or len(body) < COMPRESSION_MIN_SIZE:
+                if not message.get("more_body"):
+                    headers.add_vary_header("Accept-Encoding")
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                body = await asyncio.to_thread(_compress, body, encoding)
+            else:
+                body = _compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,242 @@
+import os
+import math
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextvars import ContextVar
+
+import metrics
+
+# Request classes. Lower goes first.
+INTERACTIVE = 0  # a user is waiting on this call (search, recommendation, the plan itself)
+BATCH = 1        # background work like attaching POIs to itinerary days
+
+# Priority for calls made from the current task; enrichment code sets BATCH.
+PRIORITY: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+# A dict a caller (resilience.call) can put in place to see what call() is doing:
+# "started" is when the current attempt got its token (None while it waits, or
+# backs off), "seconds" how long the last attempt's round trip took.
+TIMING: ContextVar[dict | None] = ContextVar("upstream_timing", default=None)
+
+
+def _quota(prefix: str, qps: float, per_minute: float, max_queue: int) -> dict:
+    return {
+        "qps": float(os.getenv(f"QUOTA_{prefix}_QPS", str(qps))),
+        "per_minute": float(os.getenv(f"QUOTA_{prefix}_PER_MINUTE", str(per_minute))),
+        "max_queue": int(os.getenv(f"QUOTA_{prefix}_MAX_QUEUE", str(max_queue))),
+    }
+
+
+# --- Configuration ---
+# Per-API limits; keep them a little under the quotas set in the Google Cloud console.
+QUOTAS = {
+    "places": _quota("PLACES", qps=10, per_minute=600, max_queue=200),
+    "geocode": _quota("GEOCODE", qps=50, per_minute=3000, max_queue=200),
+    "gemini": _quota("GEMINI", qps=5, per_minute=300, max_queue=50),
+}
+# Retries for 429 and 5xx answers, with full-jitter exponential backoff.
+RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "2"))
+RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+_retries = metrics.Counter("dishanveshi_upstream_retries_total", "Upstream calls retried after 429/5xx.", ("api",))
+_rejections = metrics.Counter("dishanveshi_upstream_rejected_total", "Calls refused because the queue was full.", ("api",))
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised when an API's queue is full. retry_after is a hint in seconds.
+    """
+
+    def __init__(self, api: str, retry_after: int):
+        super().__init__(f"{api} is over its request quota, retry in {retry_after}s")
+        self.api = api
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until one token is available (0 if one is available now).
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+class UpstreamScheduler:
+    """
+    Admits calls to one API at its configured rate.
+    Callers that can't go right away wait in a priority queue
+    (INTERACTIVE before BATCH, first come first served within a class);
+    when the queue is full they get UpstreamBusy instead of waiting.
+    """
+
+    def __init__(self, name: str, qps: float, per_minute: float, max_queue: int):
+        self.name = name
+        self.max_queue = max_queue
+        self.rate = min(qps, per_minute / 60)
+        self.buckets = [TokenBucket(qps, max(1.0, qps)), TokenBucket(per_minute / 60, per_minute)]
+        self._waiters: list = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _try_take(self) -> float:
+        """
+        Takes a token from every bucket and returns 0, or returns how long to wait.
+        """
+        now = time.monotonic()
+        wait = max(bucket.wait_time(now) for bucket in self.buckets)
+        if wait == 0:
+            for bucket in self.buckets:
+                bucket.take()
+            self.admitted += 1
+        return wait
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((len(self._waiters) + 1) / self.rate))
+
+    def on_throttled(self):
+        """
+        The API answered 429: stop admitting until the buckets refill.
+        """
+        self.throttled += 1
+        for bucket in self.buckets:
+            bucket.drain()
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        if not self._waiters and self._try_take() == 0:
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            _rejections.inc(self.name)
+            raise UpstreamBusy(self.name, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        # if the caller is cancelled the future is cancelled too and the pump skips it
+        await future
+
+    async def _pump(self):
+        while True:
+            # drop waiters that gave up
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return
+            wait = self._try_take()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiters)[2].set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "queue": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+
+_schedulers = {name: UpstreamScheduler(name, **quota) for name, quota in QUOTAS.items()}
+metrics.Gauge(
+    "dishanveshi_upstream_queue_depth", "Calls waiting for a quota token.",
+    lambda: {(name,): len(s._waiters) for name, s in _schedulers.items()}, ("api",),
+)
+
+
+async def acquire(api: str, priority: int | None = None):
+    """
+    Waits for a quota token for `api`. Use directly for calls that can't be
+    retried as a whole (e.g. a stream); everything else goes through call().
+    """
+    await _schedulers[api].acquire(PRIORITY.get() if priority is None else priority)
+
+
+def _retryable_status(result, error) -> int | None:
+    # httpx responses carry status_code; google.api_core errors carry the HTTP code
+    status = getattr(error, "code", None) if error is not None else getattr(result, "status_code", None)
+    return int(status) if isinstance(status, int) and status in RETRY_STATUSES else None
+
+
+def _backoff(attempt: int, result) -> float:
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    header = getattr(result, "headers", {}).get("Retry-After") if result is not None else None
+    if header and header.isdigit():
+        delay = max(delay, float(header))
+    return min(delay, RETRY_MAX_DELAY)
+
+
+async def call(api: str, fn, priority: int | None = None):
+    """
+    Runs `fn()` (a coroutine factory) once a quota token for `api` is free.
+    429 and 5xx answers, returned or raised, are retried with jittered backoff,
+    each attempt taking a fresh token. The last answer is returned (or raised) as is.
+    """
+    scheduler = _schedulers[api]
+    priority = PRIORITY.get() if priority is None else priority
+    timing = TIMING.get()
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        if timing is not None:
+            timing["started"] = None
+        await scheduler.acquire(priority)
+        started = loop.time()
+        if timing is not None:
+            timing["started"] = started
+        result = error = None
+        try:
+            result = await fn()
+        except Exception as e:
+            error = e
+        finally:
+            if timing is not None:
+                timing["seconds"] = loop.time() - started
+
+        status = _retryable_status(result, error)
+        if status is None or attempt >= RETRY_ATTEMPTS:
+            if error is not None:
+                raise error
+            return result
+
+        if status == 429:
+            scheduler.on_throttled()
+        _retries.inc(api)
+        if timing is not None:
+            timing["started"] = None
+        await asyncio.sleep(_backoff(attempt, result))
+        attempt += 1
+
+
+def stats() -> dict:
+    return {name: s.stats() for name, s in _schedulers.items()}
@@ -49,24 +49,95 @@ class ItineraryRequest(BaseModel):
     travel_type: str  # e.g., "relaxing", "adventure", "cultural"
     budget: str       # e.g., "low", "medium", "high"
     mood: str         # optional mood like "tired", "excited"
+    include_pois: bool = True  # attach nearby places to each day
+    fresh: bool = False        # skip the plan cache and generate a new variation
+class PlacePhoto(BaseModel):
+    name: str                # Places API photo resource name
+    width: int | None = None
+    height: int | None = None
+    attributions: list[str | None] = []
+
+class Place(BaseModel):
+    """
+    One place as every endpoint returns it, whether it came from Google or the local index.
+    """
+    place_id: str | None = None
+    name: str | None = None
+    address: str | None = None
+    lat: float
+    lng: float
+    rating: float | None = None
+    reviews: int | None = None
+    types: list[str] = []
+    website: str | None = None
+    open_now: bool | None = None
+    hours: list[str] = []   # e.g. "Monday: 9:00 AM – 5:00 PM"
+    photos: list[PlacePhoto] = []
+    distance_m: float | None = None  # only set by nearby searches
+
+class PlacesResponse(BaseModel):
+    places: list[Place]
+
 class ItineraryDay(BaseModel):
     day: int
     summary: str
+    places: list[Place] = []
 
 class ItineraryResponse(BaseModel):
     destination: str
     plan: list[ItineraryDay]
+class ItineraryJobStatus(BaseModel):
+    """
+    Where a queued itinerary is. `result` is set once status is "done",
+    `error` once it is "failed".
+    """
+    job_id: str
+    status: str  # queued, running, done, failed
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+    result: ItineraryResponse | None = None
 class ItinerarySaveRequest(BaseModel):
     destination: str
     days: int
     plan: list  
 
+class ItineraryBulkRequest(BaseModel):
+    # Items are validated one by one so a bad item doesn't reject the whole batch.
+    items: list[dict]
+
+class ItineraryBulkError(BaseModel):
+    index: int   # position of the item in the request
+    error: str
+
+class ItineraryBulkResponse(BaseModel):
+    ids: list[int | None]  # new id per item, None where the item was rejected
+    created: int
+    errors: list[ItineraryBulkError]
+
 class ItineraryDB(BaseModel):
     id: int
     destination: str
     days: int
-    plan_json: str
     created_at: datetime
+    plan: list  # the stored plan, as saved
 
     class Config:
         from_attributes = True
+
+class ItinerarySummary(BaseModel):
+    """
+    One row of the "my itineraries" list. Leaves out the (large) plan.
+    """
+    id: int
+    destination: str
+    days: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ItineraryPage(BaseModel):
+    items: list[ItinerarySummary]
+    next_cursor: str | None = None  # pass back as ?cursor= to get the next page
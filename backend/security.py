@@ -1,39 +1,129 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
 import os
-from dotenv import load_dotenv
 import asyncio
+import hashlib
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+import metrics
+from settings import settings
 
-# --- .env Configuration ---
-# This line loads the variables from your .env file (e.g., SECRET_KEY)
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
+# --- Configuration ---
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Validated tokens are remembered so protected routes skip JWT decoding and the user lookup.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+# bcrypt runs on its own thread pool, one worker per core by default
+# (bcrypt releases the GIL, so threads use every core without process overhead).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hash/verify jobs allowed to queue before new ones are turned away with a 503.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
 
 if not SECRET_KEY:
     raise Exception("SECRET_KEY not set in .env file")
 
 # --- Password Hashing (from before) ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+_hash_rejected = 0
+metrics.Gauge("dishanveshi_password_hash_pending", "bcrypt jobs queued or running.", lambda: _hash_pending)
+_hash_rejections = metrics.Counter("dishanveshi_password_hash_rejected_total", "bcrypt jobs turned away by admission control.")
+# Verified against when the email is unknown, so a miss costs the same as a wrong password.
+_dummy_hash = None
+
+
+def pwd_context():
+    """
+    The passlib CryptContext, built on first use: passlib and bcrypt load
+    with the first hash or verify (on the hashing pool), not at startup.
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def _hash(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def _verify(plain_password, hashed_password) -> bool:
+    return pwd_context().verify(plain_password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when too many hash/verify jobs are already queued.
+    """
+    pass
+
+
+async def _run_hash_job(fn, *args):
+    """
+    Runs one bcrypt call on the hashing pool, or refuses straight away
+    once PASSWORD_HASH_MAX_PENDING jobs are waiting, so a login flood
+    queues in front of bcrypt instead of in front of everything else.
+    """
+    global _hash_pending, _hash_rejected
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        _hash_rejected += 1
+        _hash_rejections.inc()
+        raise PasswordHasherBusy("Too many logins in progress, try again shortly")
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_pending -= 1
+
 
 async def verify_password_async(plain_password, hashed_password):
     """ Verifies a plain password against a hashed password. Returns True if they match, False otherwise. """
-    return await asyncio.to_thread(
-        pwd_context.verify,
-        plain_password,
-        hashed_password
-    )
+    global _dummy_hash
+    if hashed_password is None:
+        if _dummy_hash is None:
+            _dummy_hash = await _run_hash_job(_hash, "dummy-password")
+        await _run_hash_job(_verify, plain_password, _dummy_hash)
+        return False
+    return await _run_hash_job(_verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """
     Hashes a plain password.
     Returns the hash.
+    Blocking; from async code use get_password_hash_async.
+    """
+    return _hash(password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hashes a plain password on the bounded hashing pool.
+    """
+    return await _run_hash_job(_hash, password)
+
+def password_hasher_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": _hash_pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "rejected": _hash_rejected,
+    }
+
+def shutdown():
+    """
+    Stops the hashing threads. Called on app shutdown.
     """
-    return pwd_context.hash(password)
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
 
 
 # --- JWT (Token) Schemas ---
@@ -70,3 +160,71 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+
+# --- Authenticated principal cache ---
+
+_principal_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+_tokens_by_email: dict[str, set[str]] = {}
+_cached_since_sweep = 0
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_cached_principal(token: str):
+    """
+    Returns (claims, user) for a token validated recently, or None.
+    """
+    return _principal_cache.get(_token_digest(token))
+
+
+def cache_principal(token: str, claims: dict, user):
+    """
+    Remembers a validated token. The entry never outlives the token's `exp`.
+    """
+    ttl = AUTH_CACHE_TTL
+    exp = claims.get("exp")
+    if exp is not None:
+        ttl = min(ttl, float(exp) - time.time())
+    if ttl <= 0:
+        return
+    digest = _token_digest(token)
+    _principal_cache.set(digest, (claims, user), ttl=ttl)
+    digests = _tokens_by_email.setdefault(user.email, set())
+    digests.add(digest)
+    # forget digests the cache has already evicted
+    if len(digests) > 16:
+        digests &= {d for d in digests if d in _principal_cache}
+    global _cached_since_sweep
+    _cached_since_sweep += 1
+    if _cached_since_sweep >= max(256, len(_tokens_by_email)):
+        _sweep_tokens_by_email()
+
+
+def _sweep_tokens_by_email():
+    """
+    Drops the emails whose cached tokens have all expired or been evicted,
+    so the reverse index stays about the size of the cache itself.
+    Runs once per len(_tokens_by_email) cached tokens: amortized O(1) each.
+    """
+    global _cached_since_sweep
+    _cached_since_sweep = 0
+    for email in list(_tokens_by_email):
+        digests = {d for d in _tokens_by_email[email] if d in _principal_cache}
+        if digests:
+            _tokens_by_email[email] = digests
+        else:
+            del _tokens_by_email[email]
+
+
+def invalidate_user(email: str):
+    """
+    Drops every cached token for this user. Call whenever a user row changes.
+    """
+    for digest in _tokens_by_email.pop(email, ()):
+        _principal_cache.pop(digest)
+
+
+def auth_cache_stats() -> dict:
+    return _principal_cache.stats()
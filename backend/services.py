@@ -1,60 +1,83 @@
 import os
-import httpx
-import google.generativeai as genai
+import asyncio
+import logging
+import copy
 import re
 import urllib.parse
-from dotenv import load_dotenv
-
-load_dotenv()
+import unicodedata
+from datetime import datetime, timedelta
+import http_client
+import llm
+import places_client
+import CRUD
+import scheduler
+import resilience
+from cache import TTLCache, SingleFlight, StreamFlight
+from places_cache import places_cache
+from poi_index import poi_index, POI_INDEX_ENABLED
+from itinerary_parser import parse_itinerary, classify_poi_query, DayStreamParser
+from database import async_session
+from settings import settings
+
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GOOGLE_MAPS_API_KEY = settings.google_maps_api_key
+
+# POI enrichment: max concurrent Google calls (shared by all requests)
+# and how long the whole enrichment stage may take before we return partial results.
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "16"))
+ENRICH_DEADLINE_SECONDS = float(os.getenv("ENRICH_DEADLINE_SECONDS", "8"))
+POIS_PER_DAY = int(os.getenv("POIS_PER_DAY", "3"))
+_enrich_semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+# Geocode cache: in-process LRU in front of the geocode_cache table.
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "2048"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", "21600"))  # 6 hours
+GEOCODE_DB_TTL_DAYS = int(os.getenv("GEOCODE_DB_TTL_DAYS", "30"))
+_geocode_cache = TTLCache(GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL)
+_geocode_counters = {"db_hits": 0, "db_misses": 0, "upstream_calls": 0}
+
+# Generated plans keyed by the normalized request.
+ITINERARY_CACHE_SIZE = int(os.getenv("ITINERARY_CACHE_SIZE", "512"))
+ITINERARY_CACHE_TTL = float(os.getenv("ITINERARY_CACHE_TTL", "86400"))  # 1 day
+_itinerary_cache = TTLCache(ITINERARY_CACHE_SIZE, ITINERARY_CACHE_TTL)
+_itinerary_flights = SingleFlight()
+_itinerary_streams = StreamFlight()
 
-# Configure Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 async def get_google_places(lat: float, lng: float, query: str = "restaurant"):
     """
-    Fetches places from Google Maps Places API (New Text Search).
+    Places around (lat, lng) matching `query`, as compact place records.
+    Results are shared by everyone searching from the same geohash cell.
     """
     if not GOOGLE_MAPS_API_KEY:
         return {"error": "Google Maps API Key missing"}
 
-    url = "https://places.googleapis.com/v1/places:searchText"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": GOOGLE_MAPS_API_KEY,
-        "X-Goog-FieldMask": "places.displayName,places.formattedAddress,places.location,places.rating,places.userRatingCount,places.photos"
-    }
-    
-    # We search for the query (e.g., "food", "hotel") near the user's location
-    payload = {
-        "textQuery": query,
-        "locationBias": {
-            "circle": {
-                "center": {"latitude": lat, "longitude": lng},
-                "radius": 5000.0  # 5km radius
-            }
-        }
-    }
+    async def fetch(cell_lat: float, cell_lng: float):
+        if POI_INDEX_ENABLED:
+            local = poi_index.nearby_if_covered(query, cell_lat, cell_lng, 5000, k=20)
+            if local is not None:
+                return {"places": local}
+        return {"places": await places_client.search_text(query, cell_lat, cell_lng, 5000)}
+
+    try:
+        return await places_cache.get_or_fetch("places_search", query, lat, lng, 5000, fetch)
+    except places_client.PlacesError as e:
+        return {"error": str(e)}
+    except resilience.CircuitOpen:
+        # Places is failing and nothing is cached for this cell: answer empty instead of waiting on it
+        return {"places": []}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        return {"error": f"Google API Error: {response.text}"}
 
 async def get_ai_recommendation(user_mood: str, places_summary: str):
     """
     Uses Gemini to recommend the best spot based on mood.
     """
-    if not GEMINI_API_KEY:
+    if not llm.GEMINI_API_KEY:
         return "I'm sorry, my AI brain is currently offline (API Key missing)."
 
     try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
         prompt = f"""
         You are a travel assistant. 
         The user is feeling: "{user_mood}".
@@ -64,13 +87,14 @@ async def get_ai_recommendation(user_mood: str, places_summary: str):
         Explain WHY in a short, friendly sentence. If the mood is 'tired', prioritize hotels or quiet cafes.
         """
         
-        response = model.generate_content(prompt)
-        return response.text
+        return await scheduler.call("gemini", lambda: llm.generate("gemini-2.0-flash", prompt))
+    except scheduler.UpstreamBusy:
+        raise
     except Exception as e:
         return f"AI Error: {str(e)}"
 
-async def generate_itinerary(destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool = True):
-    prompt = f"""
+def _itinerary_prompt(destination: str, days: int, travel_type: str, budget: str, mood: str) -> str:
+    return f"""
     Generate a {days}-day travel itinerary for {destination}.
     The trip style is {travel_type}, with a {budget} budget.
     Mood: {mood}.
@@ -82,221 +106,407 @@ async def generate_itinerary(destination: str, days: int, travel_type: str, budg
     Keep each day's suggestions to 2-4 short activity bullets or sentences.
     """
 
+
+def _itinerary_cache_key(destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool) -> tuple:
+    return (
+        normalize_place_name(destination),
+        days,
+        " ".join(travel_type.casefold().split()),
+        " ".join(budget.casefold().split()),
+        " ".join(mood.casefold().split()),
+        bool(include_pois),
+    )
+
+
+def is_error_plan(plan: list) -> bool:
+    """
+    Whether generate_itinerary answered with its error plan (a single day 0
+    whose summary is the error message) instead of a real one.
+    """
+    return len(plan) == 1 and plan[0]["day"] == 0
+
+
+def _complete_plan(plan: list, pois_found: bool) -> bool:
+    """
+    Whether a plan is worth caching for ITINERARY_CACHE_TTL: not the error
+    plan, not empty text, and (if POIs were asked for) with every POI search
+    answered. Degraded plans aren't cached, so the next request tries again.
+    """
+    return pois_found and not is_error_plan(plan) and any(entry["summary"] for entry in plan)
+
+
+def itinerary_cache_stats() -> dict:
+    return dict(_itinerary_cache.stats(), single_flight=_itinerary_flights.stats(), streams=_itinerary_streams.stats())
+
+
+async def generate_itinerary(destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool = True, fresh: bool = False):
+    """
+    Returns a plan for this request, reusing a cached one when an identical
+    request was answered recently. Concurrent identical requests share one
+    generation. `fresh=True` always generates a new variation (and caches it).
+    """
+    key = _itinerary_cache_key(destination, days, travel_type, budget, mood, include_pois)
+
+    async def run():
+        plan, complete = await _generate_itinerary(destination, days, travel_type, budget, mood, include_pois)
+        # don't keep errors or half-enriched plans around
+        if complete:
+            _itinerary_cache.set(key, plan)
+        return plan
+
+    if fresh:
+        return copy.deepcopy(await run())
+
+    plan = _itinerary_cache.get(key)
+    if plan is None:
+        plan = await _itinerary_flights.do(key, run)
+    return copy.deepcopy(plan)
+
+
+async def _generate_itinerary(destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool = True):
+    """
+    Returns (plan, complete); `complete` is False when the plan came out
+    degraded (see _complete_plan).
+    """
+    prompt = _itinerary_prompt(destination, days, travel_type, budget, mood)
+
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        raw = response.text or ""
-        print("🔹 RAW GEMINI RESPONSE:\n", raw)
-
-        # --- parsing (same robust parser you already have) ---
-        text = raw.replace("\r\n", "\n").strip()
-        text = re.sub(r"\*{1,3}", "", text)
-        text = re.sub(r"\u2022", "-", text)
-        text = re.sub(r"\n\s*\n+", "\n\n", text)
-
-        day_split_regex = re.compile(r"(?:^|\n)(Day\s*\d+[:\-\)]?)", flags=re.IGNORECASE)
-        parts = day_split_regex.split(text)
-
-        plan = []
-        if len(parts) > 1:
-            i = 1
-            while i < len(parts):
-                marker = parts[i].strip()
-                body = parts[i+1].strip() if i+1 < len(parts) else ""
-                m = re.search(r"(\d+)", marker)
-                day_num = int(m.group(1)) if m else len(plan) + 1
-                body = re.sub(r"\n\s*\-\s*", " • ", body)
-                body = re.sub(r"\n", " ", body)
-                body = " ".join(body.split())
-                plan.append({"day": day_num, "summary": body, "places": []})
-                i += 2
-        else:
-            # fallback splitting into sentences (existing fallback)
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-            if len(sentences) <= days:
-                for idx in range(days):
-                    summary = sentences[idx].strip() if idx < len(sentences) else ""
-                    plan.append({"day": idx+1, "summary": summary, "places": []})
-            else:
-                chunk_size = max(1, len(sentences) // days)
-                for idx in range(days):
-                    chunk = sentences[idx*chunk_size:(idx+1)*chunk_size]
-                    summary = " ".join(s.strip() for s in chunk)
-                    plan.append({"day": idx+1, "summary": summary, "places": []})
+        raw = await scheduler.call("gemini", lambda: llm.generate("gemini-2.5-flash", prompt))
+        logger.debug("Raw Gemini response for %s:\n%s", destination, raw)
 
-        # Ensure list length matches days
-        if len(plan) < days:
-            for fill_day in range(len(plan)+1, days+1):
-                plan.append({"day": fill_day, "summary": "", "places": []})
+        plan = parse_itinerary(raw, days)
+        pois_found = True
 
         # --- ENRICH: resolve destination coords and attach POIs ---
         if include_pois and GOOGLE_MAPS_API_KEY:
-            coords = await geocode_place(destination)
+            try:
+                coords = await geocode_place(destination)
+            except scheduler.UpstreamBusy:
+                # out of geocoding quota: the plan is still useful without POIs
+                coords = None
             if coords:
-                lat, lng = coords
-                # For each day, call get_google_places using the day's summary as the query context.
-                # The existing get_google_places expects (lat, lng, query)
-                for entry in plan:
-                    # choose a short search query: prefer 'tourist attraction' if summary suggests sightseeing,
-                    # otherwise try the whole summary. Simpler approach: use 'tourist attraction' for now.
-                    # You can later improve by detecting keywords like "museum", "restaurant", "fort"
-                    query = "tourist attraction"
-                    # If the summary mentions 'restaurant' or 'dinner' use restaurant query
-                    if re.search(r"\b(restaurant|food|dinner|lunch|breakfast|cafe|snack)\b", entry["summary"], flags=re.IGNORECASE):
-                        query = "restaurant"
-                    # If summary mentions 'hotel' or 'resort'
-                    if re.search(r"\b(hotel|resort|stay|accommodat)\b", entry["summary"], flags=re.IGNORECASE):
-                        query = "hotel"
-
-                    entry["places"] = await search_places_with_details(query, lat, lng)
-                    attached = []
-                    try:
-                        results = places_resp.get("places", []) or places_resp.get("results", []) or []
-                        # Field names differ by API; try common fields carefully
-                        for p in results[:3]:
-                            # best-effort extraction
-                            name = p.get("displayName") or p.get("name") or p.get("place_name") or p.get("formatted_address")
-                            addr = p.get("formattedAddress") or p.get("formatted_address") or p.get("vicinity") or ""
-                            location = p.get("location") or p.get("geometry", {}).get("location") or p.get("geometry")
-                            latp = None; lngp = None
-                            if isinstance(location, dict):
-                                latp = location.get("lat") or location.get("latitude") or location.get("latitudeE7")
-                                lngp = location.get("lng") or location.get("longitude") or location.get("longitudeE7")
-                            rating = p.get("rating") or p.get("userRatingCount") or None
-                            attached.append({
-                                "name": name,
-                                "address": addr,
-                                "lat": latp,
-                                "lng": lngp,
-                                "rating": rating
-                            })
-                    except Exception as e:
-                        attached = []
-                    entry["places"] = attached
+                # one search per distinct query for the whole trip, not one per day
+                planner = PoiPlanner(*coords)
+                try:
+                    await planner.plan(plan)
+                finally:
+                    planner.close()
+                pois_found = not planner.degraded
             else:
                 # geocoding failed; leave `places` empty
-                pass
+                pois_found = False
 
-        return plan
+        return plan, _complete_plan(plan, pois_found)
 
+    except scheduler.UpstreamBusy:
+        raise
     except Exception as e:
-        return [{"day": 0, "summary": f"Error generating itinerary: {str(e)}", "places": []}]
+        return [{"day": 0, "summary": f"Error generating itinerary: {str(e)}", "places": []}], False
+
+
+async def stream_itinerary(destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool = True, fresh: bool = False):
+    """
+    Streaming version of generate_itinerary.
+    Yields ("day", {...}) as soon as each day is parsed from the Gemini stream,
+    then ("places", {"day", "places"}) once that day's POIs are fetched,
+    and finally ("done", {...}) or ("error", {...}).
+    A cached plan for the same request is replayed right away, and
+    concurrent identical requests share one generation.
+    """
+    key = _itinerary_cache_key(destination, days, travel_type, budget, mood, include_pois)
+    cached = None if fresh else _itinerary_cache.get(key)
+    if cached is not None:
+        for entry in copy.deepcopy(cached):
+            yield ("day", {"day": entry["day"], "summary": entry["summary"]})
+            if include_pois:
+                yield ("places", {"day": entry["day"], "places": entry["places"]})
+        yield ("done", {"destination": destination, "days": len(cached)})
+        return
+
+    # identical requests share one producer; a fresh variation is nobody else's
+    flight_key = object() if fresh else key
+
+    def producer(publish):
+        return _produce_itinerary(key, publish, destination, days, travel_type, budget, mood, include_pois)
+
+    async for event in _itinerary_streams.subscribe(flight_key, producer):
+        yield event
+
+
+async def _produce_itinerary(key: tuple, publish, destination: str, days: int, travel_type: str, budget: str, mood: str, include_pois: bool):
+    """
+    Generates one streamed plan, sending its events through `publish`,
+    and caches the plan if it came out complete.
+    """
+    prompt = _itinerary_prompt(destination, days, travel_type, budget, mood)
+    enrich_tasks = []
+    planners = []
+    plan = []
+    pois_found = True
+
+    async def make_planner():
+        try:
+            coords = await geocode_place(destination)
+        except Exception:
+            coords = None
+        if not coords:
+            return None
+        planners.append(PoiPlanner(*coords))
+        return planners[0]
+
+    # geocoding runs while Gemini is still writing the plan
+    planner_task = None
+    if include_pois and GOOGLE_MAPS_API_KEY:
+        planner_task = asyncio.create_task(make_planner())
+
+    async def enrich(entry: dict):
+        nonlocal pois_found
+        planner = await planner_task
+        if planner is None:
+            pois_found = False
+        else:
+            # days arrive one by one, but still share searches and never repeat a place
+            await planner.assign(classify_poi_query(entry["summary"]), [entry])
+            pois_found = pois_found and not planner.degraded
+        publish(("places", {"day": entry["day"], "places": entry["places"]}))
+
+    def emit_day(entry: dict):
+        plan.append(entry)
+        publish(("day", {"day": entry["day"], "summary": entry["summary"]}))
+        if planner_task is not None:
+            enrich_tasks.append(asyncio.create_task(enrich(entry)))
+
+    parser = DayStreamParser(days)
+    try:
+        # a stream can't be replayed, so it takes a quota token but isn't retried
+        await scheduler.acquire("gemini")
+        async for chunk in llm.stream("gemini-2.5-flash", prompt):
+            for entry in parser.feed(chunk):
+                emit_day(entry)
+        for entry in parser.finish():
+            emit_day(entry)
+        results = await asyncio.gather(*enrich_tasks, return_exceptions=True)
+        if _complete_plan(plan, pois_found and not any(isinstance(r, BaseException) for r in results)):
+            _itinerary_cache.set(key, plan)
+        publish(("done", {"destination": destination, "days": parser.emitted}))
+    except scheduler.UpstreamBusy as e:
+        publish(("error", {"detail": str(e), "retry_after": e.retry_after}))
+    except Exception as e:
+        publish(("error", {"detail": f"Error generating itinerary: {str(e)}"}))
+    finally:
+        # done, or every client went away: stop everything still running
+        for task in enrich_tasks + ([planner_task] if planner_task else []):
+            if not task.done():
+                task.cancel()
+        for planner in planners:
+            planner.close()
+
+
+def normalize_place_name(place_name: str) -> str:
+    """
+    Normalizes a destination string so "  pune ", "Pune" and "PUNE!" share a cache key.
+    """
+    text = unicodedata.normalize("NFKC", place_name).casefold()
+    text = re.sub(r"[^\w\s,]", " ", text)
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return " ".join(text.split()).strip(" ,")
+
+
+def geocode_cache_stats() -> dict:
+    """
+    Hit/miss counters for both geocode cache tiers.
+    """
+    return {
+        "memory": _geocode_cache.stats(),
+        "db_hits": _geocode_counters["db_hits"],
+        "db_misses": _geocode_counters["db_misses"],
+        "upstream_calls": _geocode_counters["upstream_calls"],
+    }
+
+
+async def _geocode_from_db(key: str, max_age_days: int | None = GEOCODE_DB_TTL_DAYS):
+    try:
+        async with async_session() as db:
+            row = await CRUD.get_geocode(db, key)
+    except Exception:
+        return None
+    if row is None:
+        return None
+    if max_age_days is not None and row.updated_at < datetime.utcnow() - timedelta(days=max_age_days):
+        return None
+    return row.lat, row.lng
+
+
+async def _geocode_to_db(key: str, coords: tuple):
+    try:
+        async with async_session() as db:
+            await CRUD.save_geocode(db, key, coords[0], coords[1])
+    except Exception:
+        # another worker may have inserted the same key; the cache is best-effort
+        pass
+
+
 async def geocode_place(place_name: str):
     """
     Convert a place name into lat/lng using Google Geocoding API.
     Returns (lat, lng) or None on failure.
+    Looks in the in-process LRU first, then the geocode_cache table,
+    and only then calls Google.
     """
+    key = normalize_place_name(place_name)
+    if not key:
+        return None
+
+    coords = _geocode_cache.get(key)
+    if coords is not None:
+        return coords
+
+    coords = await _geocode_from_db(key)
+    if coords is not None:
+        _geocode_counters["db_hits"] += 1
+        _geocode_cache.set(key, coords)
+        return coords
+    _geocode_counters["db_misses"] += 1
+
+    try:
+        coords = await _geocode_upstream(place_name)
+    except resilience.CircuitOpen:
+        # Geocoding is failing: an expired row is better than nothing
+        return await _geocode_from_db(key, max_age_days=None)
+    if coords is not None:
+        _geocode_cache.set(key, coords)
+        await _geocode_to_db(key, coords)
+    return coords
+
+
+async def _geocode_upstream(place_name: str):
     if not GOOGLE_MAPS_API_KEY:
         return None
 
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    url = "/maps/api/geocode/json"
     params = {"address": place_name, "key": GOOGLE_MAPS_API_KEY}
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, params=params, timeout=15.0)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        if data.get("results"):
-            loc = data["results"][0]["geometry"]["location"]
-            return float(loc["lat"]), float(loc["lng"])
+    _geocode_counters["upstream_calls"] += 1
+    client = http_client.get_client("maps")
+    r = await resilience.call("geocode", lambda: scheduler.call("geocode", lambda: client.get(url, params=params)))
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    if data.get("results"):
+        loc = data["results"][0]["geometry"]["location"]
+        return float(loc["lat"]), float(loc["lng"])
     return None
-async def search_places_with_details(query: str, lat: float, lng: float):
-    if not GOOGLE_MAPS_API_KEY:
-        return {"error": "Missing API key"}
-
-    # 1. TEXT SEARCH (to find place_id)
-    text_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        "query": query,
-        "location": f"{lat},{lng}",
-        "radius": 5000,
-        "key": GOOGLE_MAPS_API_KEY
-    }
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(text_url, params=params)
-        results = r.json().get("results", [])[:3]
-
-        final_places = []
-        for r in results:
-            place_id = r.get("place_id")
-            if not place_id:
-                continue
-
-            # 2. DETAILS API (richer info)
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            d_params = {
-                "place_id": place_id,
-                "fields": "name,rating,user_ratings_total,formatted_address,geometry,"
-                          "types,photos,website,opening_hours",
-                "key": GOOGLE_MAPS_API_KEY
-            }
-            d = await client.get(details_url, params=d_params)
-            det = d.json().get("result", {})
-
-            final_places.append({
-                "name": det.get("name"),
-                "address": det.get("formatted_address"),
-                "lat": det.get("geometry", {}).get("location", {}).get("lat"),
-                "lng": det.get("geometry", {}).get("location", {}).get("lng"),
-                "rating": det.get("rating"),
-                "reviews": det.get("user_ratings_total"),
-                "website": det.get("website"),
-                "types": det.get("types", []),
-                "photos": det.get("photos", [])
-            })
-
-        return final_places
-async def search_places_with_details(query: str, lat: float, lng: float, radius: int = 5000, max_results: int = 3):
+
+class PoiPlanner:
     """
-    Text Search -> Place Details pipeline.
-    Returns a list of place dicts with name, address, coords, rating, reviews, website, types, photos.
+    Plans the POI lookups of one itinerary.
+    Days share one of a handful of queries around the same destination, so each
+    distinct query is searched once, and a place handed to one day is never
+    handed to another. Search results already carry every field we show,
+    so there is no per-place follow-up call.
     """
-    if not GOOGLE_MAPS_API_KEY:
-        return {"error": "Missing Google Maps API key"}
-
-    text_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        "query": query,
-        "location": f"{lat},{lng}",
-        "radius": radius,
-        "key": GOOGLE_MAPS_API_KEY
-    }
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        r = await client.get(text_url, params=params)
-        if r.status_code != 200:
-            return {"error": f"Places Text Search error: {r.text}"}
-        text_results = r.json().get("results", [])[:max_results]
-
-        final_places = []
-        for r_item in text_results:
-            place_id = r_item.get("place_id")
-            if not place_id:
-                continue
-
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            d_params = {
-                "place_id": place_id,
-                "fields": "name,rating,user_ratings_total,formatted_address,geometry,types,photos,website,opening_hours",
-                "key": GOOGLE_MAPS_API_KEY
-            }
-            d = await client.get(details_url, params=d_params)
-            if d.status_code != 200:
-                continue
-            det = d.json().get("result", {})
-
-            final_places.append({
-                "name": det.get("name"),
-                "address": det.get("formatted_address"),
-                "lat": det.get("geometry", {}).get("location", {}).get("lat"),
-                "lng": det.get("geometry", {}).get("location", {}).get("lng"),
-                "rating": det.get("rating"),
-                "reviews": det.get("user_ratings_total"),
-                "website": det.get("website"),
-                "types": det.get("types", []),
-                "photos": det.get("photos", [])  # client can request photo using photo_reference via Places Photo API
-            })
-
-        return final_places
+    def __init__(self, lat: float, lng: float, per_day: int = POIS_PER_DAY):
+        self.lat = lat
+        self.lng = lng
+        self.per_day = per_day
+        self._searches: dict[str, asyncio.Task] = {}
+        self._deadlines: dict[str, float] = {}
+        self._used: set = set()
+        # a search failed or missed its deadline, so some days got fewer places than they could have
+        self.degraded = False
+        self.counters = {"days": 0, "searches": 0}
+
+    def _remaining(self, query: str) -> float:
+        return max(0.0, self._deadlines[query] - asyncio.get_running_loop().time())
+
+    def _candidates(self, query: str) -> asyncio.Task:
+        task = self._searches.get(query)
+        if task is None:
+            self.counters["searches"] += 1
+            # the deadline runs from the search's own start, so a day parsed late
+            # in a stream still gets the full wait for the search it starts
+            self._deadlines[query] = asyncio.get_running_loop().time() + ENRICH_DEADLINE_SECONDS
+            task = self._searches[query] = asyncio.create_task(_poi_candidates(query, self.lat, self.lng))
+            task.add_done_callback(_retrieve)
+        return task
+
+    def close(self):
+        """
+        Cancels the searches still running; nobody is going to wait for them.
+        """
+        for task in self._searches.values():
+            if not task.done():
+                task.cancel()
+
+    async def plan(self, plan: list):
+        """
+        Attaches POIs to every day of a finished plan. Days with the same query
+        get the search results dealt out round-robin, so a short list is
+        spread evenly instead of filling the first days only.
+        """
+        groups: dict[str, list] = {}
+        for entry in plan:
+            groups.setdefault(classify_poi_query(entry["summary"]), []).append(entry)
+        # start every search before dealing, so they run at the same time
+        for query in groups:
+            self._candidates(query)
+        for query, entries in groups.items():
+            await self.assign(query, entries)
+
+    async def assign(self, query: str, entries: list):
+        """
+        Gives `entries` (days sharing `query`) up to per_day unused places each.
+        Called with a single entry as days stream in.
+        """
+        self.counters["days"] += len(entries)
+        search = self._candidates(query)
+        try:
+            candidates = await asyncio.wait_for(asyncio.shield(search), self._remaining(query))
+        except Exception:
+            candidates = []
+            self.degraded = True
+
+        fresh = [c for c in candidates if _poi_key(c) not in self._used]
+        for entry in entries:
+            entry["places"] = []
+        taken = 0
+        for _ in range(self.per_day):
+            for entry in entries:
+                if taken < len(fresh):
+                    entry["places"].append(fresh[taken])
+                    self._used.add(_poi_key(fresh[taken]))
+                    taken += 1
+
+
+def _retrieve(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()  # retrieved, so asyncio doesn't log a search that failed after its deadline
+
+
+def _poi_key(place: dict):
+    return place.get("place_id") or (place.get("name"), place.get("lat"), place.get("lng"))
+
+
+async def _poi_candidates(query: str, lat: float, lng: float) -> list:
+    """
+    Every place one search finds around the destination: from the local POI
+    index when the area is well covered, otherwise one Text Search (cached per cell).
+    """
+    async def fetch(cell_lat: float, cell_lng: float):
+        if POI_INDEX_ENABLED:
+            local = poi_index.nearby_if_covered(query, cell_lat, cell_lng, 5000, k=20)
+            if local is not None:
+                return local
+        async with _enrich_semaphore:
+            return await places_client.search_text(query, cell_lat, cell_lng, 5000)
+
+    # POIs are nice-to-have: queue behind calls a user is actively waiting on.
+    # Set here, in the search itself: a task copies its creator's context, which is interactive.
+    priority = scheduler.PRIORITY.set(scheduler.BATCH)
+    try:
+        return await places_cache.get_or_fetch("itinerary", query, lat, lng, 5000, fetch)
+    finally:
+        scheduler.PRIORITY.reset(priority)
+
@@ -0,0 +1,30 @@
+import os
+
+from dotenv import load_dotenv
+
+# The only place .env is read. main imports this before any other internal module,
+# so the os.getenv calls in each module's "# --- Configuration ---" block see it too.
+load_dotenv()
+
+
+class Settings:
+    """
+    Settings shared across modules, read from the environment once at import.
+    Tuning knobs that only one module uses stay in that module.
+    """
+
+    def __init__(self):
+        self.secret_key = os.getenv("SECRET_KEY")
+        self.database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./travel_app.db")
+        self.gemini_api_key = os.getenv("GEMINI_API_KEY")
+        self.google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        # Startup only checks the schema version; set this to apply pending
+        # migrations instead of refusing to start. On by default for local
+        # SQLite files (dev checkouts), off for server databases.
+        auto_migrate = "true" if self.database_url.startswith("sqlite") else "false"
+        self.db_auto_migrate = os.getenv("DB_AUTO_MIGRATE", auto_migrate).lower() in ("1", "true", "yes")
+        # Print the full startup profile (slowest imports, each init step) on boot.
+        self.startup_profile = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+
+
+settings = Settings()
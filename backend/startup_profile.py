@@ -0,0 +1,139 @@
+"""
+Where startup time goes.
+
+Importing this module starts the clock and installs an import hook that
+times every module loaded from the filesystem on the main thread (how long
+it took including what it imported, and on its own). main imports it before
+anything else; lifespan steps are timed with step(), and finish() removes
+the hook once the app is ready. report() is served at /api/startup.
+"""
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from importlib.machinery import PathFinder
+
+_started = time.perf_counter()
+_main_thread = threading.get_ident()
+_imports: dict[str, tuple[float, float]] = {}   # module -> (seconds, self seconds)
+_children: list[float] = []                      # per import in progress: time spent in nested imports
+_steps: list[tuple[str, float]] = []
+_last_mark = _started
+_finished = None
+
+
+class _ImportTimer:
+    """
+    Sits just in front of PathFinder on sys.meta_path, so it finds exactly
+    what PathFinder would, and wraps the loader's exec_module with a timer.
+    """
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        if threading.get_ident() != _main_thread:
+            return None
+        spec = PathFinder.find_spec(name, path, target)
+        if spec is None or spec.loader is None or isinstance(spec.loader, type):
+            return spec
+        loader = spec.loader
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            del loader.exec_module  # back to the loader's own method
+            _children.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = _children.pop()
+                if _children:
+                    _children[-1] += elapsed
+                _imports[name] = (elapsed, elapsed - nested)
+
+        try:
+            loader.exec_module = timed_exec_module
+        except AttributeError:
+            pass
+        return spec
+
+
+def _install():
+    for i, finder in enumerate(sys.meta_path):
+        if finder is PathFinder:
+            sys.meta_path.insert(i, _ImportTimer)
+            return
+
+
+def _uninstall():
+    if _ImportTimer in sys.meta_path:
+        sys.meta_path.remove(_ImportTimer)
+
+
+_install()
+
+
+def mark(name: str):
+    """
+    Records the time since the previous mark or step as a step called `name`.
+    """
+    global _last_mark
+    now = time.perf_counter()
+    _steps.append((name, now - _last_mark))
+    _last_mark = now
+
+
+@contextmanager
+def step(name: str):
+    """
+    Times the block as one startup step.
+    """
+    global _last_mark
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _last_mark = time.perf_counter()
+        _steps.append((name, _last_mark - start))
+
+
+def finish() -> float:
+    """
+    Stops timing imports and returns the seconds since this module was imported.
+    """
+    global _finished
+    _uninstall()
+    if _finished is None:
+        _finished = time.perf_counter()
+    return _finished - _started
+
+
+def report(top: int = 20) -> dict:
+    """
+    The init steps in order and the `top` slowest top-level imports
+    (packages and our own modules; each includes what it imported).
+    """
+    top_level = sorted(
+        ((name, t) for name, t in _imports.items() if "." not in name),
+        key=lambda item: item[1][0], reverse=True
+    )
+    return {
+        "total_seconds": round((_finished or time.perf_counter()) - _started, 4),
+        "finished": _finished is not None,
+        "steps": [{"step": name, "seconds": round(seconds, 4)} for name, seconds in _steps],
+        "imports": [
+            {"module": name, "seconds": round(seconds, 4), "self_seconds": round(own, 4)}
+            for name, (seconds, own) in top_level[:top]
+        ],
+        "modules_imported": len(_imports),
+    }
+
+
+def print_report(top: int = 15):
+    profile = report(top)
+    print(f"⏱️ Startup profile ({profile['total_seconds']:.3f}s, {profile['modules_imported']} modules imported)")
+    for entry in profile["steps"]:
+        print(f"   {entry['seconds'] * 1000:8.1f} ms  {entry['step']}")
+    print("   slowest imports (including what they import):")
+    for entry in profile["imports"]:
+        print(f"   {entry['seconds'] * 1000:8.1f} ms  {entry['module']} (self {entry['self_seconds'] * 1000:.1f} ms)")
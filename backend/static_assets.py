@@ -0,0 +1,142 @@
+import os
+import re
+import copy
+import gzip
+import hashlib
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+
+import brotli
+from fastapi import Request
+from fastapi.responses import Response
+
+from responses import choose_encoding, etag_matches
+
+# --- Configuration ---
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend"))
+ENTRY_PAGE = "index.html"
+
+# Fingerprinted names change whenever the content does, so they can be cached forever;
+# the entry page and the plain names are revalidated (a 304 when nothing changed).
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/javascript", "application/javascript",
+                      "application/json", "image/svg+xml", "text/plain"}
+# src="app.js", href='style.css', url(logo.png): local references we can point at fingerprinted names
+_REFERENCE = re.compile(r"""(?P<prefix>\b(?:src|href)=["']|url\(["']?)(?P<path>[^"')?#:]+)""")
+
+
+class Asset:
+    """
+    One servable file: its encoded bodies (always "identity", plus "br"/"gzip"
+    when they are smaller) and the validators every response carries.
+    """
+    __slots__ = ("content_type", "bodies", "etags", "last_modified", "cache_control")
+
+    def __init__(self, content_type: str, body: bytes, digest: str, mtime: float, cache_control: str):
+        self.content_type = content_type
+        self.bodies = {"identity": body}
+        self.etags = {"identity": f'"{digest}"'}
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.cache_control = cache_control
+        if content_type.partition(";")[0] in COMPRESSIBLE_TYPES:
+            for encoding, compressed in (("br", brotli.compress(body, quality=11)),
+                                         ("gzip", gzip.compress(body, compresslevel=9, mtime=0))):
+                if len(compressed) < len(body) * 0.9:
+                    self.bodies[encoding] = compressed
+                    self.etags[encoding] = f'"{digest}-{encoding}"'
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return content_type + "; charset=utf-8" if content_type.startswith("text/") or content_type.endswith("javascript") else content_type
+
+
+def _rewrite(text: str, fingerprinted: dict) -> str:
+    def replace(match):
+        path = match.group("path")
+        name = path.removeprefix("./").removeprefix("/")
+        return match.group("prefix") + ("/" + fingerprinted[name] if name in fingerprinted else path)
+    return _REFERENCE.sub(replace, text)
+
+
+def build(directory: str = FRONTEND_DIR) -> dict[str, Asset]:
+    """
+    Reads the frontend folder once and returns {url path: Asset}.
+
+    Every file except the entry page is also published under a fingerprinted
+    name (app.js -> app.3f9c2d1e7a.js). References in HTML and CSS are
+    rewritten to those names first, so a stylesheet's hash covers the images
+    it points at and the entry page always names the current files.
+    """
+    if not os.path.isdir(directory):
+        return {}
+    names = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.is_file() and not entry.name.startswith(".")
+    )
+    # leaves first, then stylesheets, then pages: each file is hashed after what it references
+    order = {".css": 1, ".html": 2}
+    names.sort(key=lambda n: order.get(os.path.splitext(n)[1], 0))
+
+    assets: dict[str, Asset] = {}
+    fingerprinted: dict[str, str] = {}
+    newest = 0.0
+    for name in names:
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            body = f.read()
+        mtime = os.path.getmtime(path)
+        newest = max(newest, mtime)
+        if name.endswith((".html", ".css")):
+            body = _rewrite(body.decode("utf-8"), fingerprinted).encode("utf-8")
+            # its content changes with the files it references
+            mtime = newest
+        digest = hashlib.sha256(body).hexdigest()[:10]
+        content_type = _content_type(name)
+
+        assets["/" + name] = Asset(content_type, body, digest, mtime, REVALIDATE)
+        if name != ENTRY_PAGE:
+            stem, ext = os.path.splitext(name)
+            fingerprinted[name] = f"{stem}.{digest}{ext}"
+            # same bodies, only the cache policy differs
+            hashed = copy.copy(assets["/" + name])
+            hashed.cache_control = IMMUTABLE
+            assets["/" + fingerprinted[name]] = hashed
+    if ENTRY_PAGE in names:
+        assets["/"] = assets["/" + ENTRY_PAGE]
+    return assets
+
+
+def _not_modified(request: Request, asset: Asset) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, asset.etags.values())
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(asset.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(request: Request, asset: Asset) -> Response:
+    """
+    The asset in the best encoding the client accepts, or a 304 when
+    its cached copy (by ETag, else Last-Modified) is still current.
+    """
+    available = tuple(e for e in ("br", "gzip") if e in asset.bodies)
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), available) or "identity"
+    headers = {
+        "ETag": asset.etags[encoding],
+        "Last-Modified": asset.last_modified,
+        "Cache-Control": asset.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request, asset):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(asset.bodies[encoding], media_type=asset.content_type, headers=headers)
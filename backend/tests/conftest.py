@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the backend modules are imported by plain name, as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("SECRET_KEY", "test")
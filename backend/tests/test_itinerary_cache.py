@@ -0,0 +1,73 @@
+import asyncio
+
+import llm
+import scheduler
+import services
+
+RAW = "Day 1: Visit the fort.\nDay 2: Lunch by the river.\n"
+
+
+def _fake_gemini(monkeypatch, calls: list):
+    async def generate(model_name, prompt, timeout=None):
+        calls.append(prompt)
+        await asyncio.sleep(0.01)
+        return RAW
+
+    monkeypatch.setattr(llm, "generate", generate)
+
+
+def test_plan_without_pois_is_not_cached(monkeypatch):
+    calls = []
+    _fake_gemini(monkeypatch, calls)
+    monkeypatch.setattr(services, "GOOGLE_MAPS_API_KEY", "test")
+
+    async def busy(place_name):
+        raise scheduler.UpstreamBusy("geocode", retry_after=1)
+
+    monkeypatch.setattr(services, "geocode_place", busy)
+
+    async def scenario():
+        for _ in range(2):
+            plan = await services.generate_itinerary("Degraded Town", 2, "solo", "low", "calm")
+            assert [entry["places"] for entry in plan] == [[], []]
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_complete_plan_is_cached(monkeypatch):
+    calls = []
+    _fake_gemini(monkeypatch, calls)
+    monkeypatch.setattr(services, "GOOGLE_MAPS_API_KEY", "")
+
+    async def scenario():
+        first = await services.generate_itinerary("Cached Town", 2, "solo", "low", "calm")
+        second = await services.generate_itinerary("Cached Town", 2, "solo", "low", "calm")
+        assert first == second
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_identical_streams_share_one_generation(monkeypatch):
+    calls = []
+    monkeypatch.setattr(services, "GOOGLE_MAPS_API_KEY", "")
+
+    async def stream(model_name, prompt, timeout=None):
+        calls.append(prompt)
+        for line in RAW.splitlines(keepends=True):
+            await asyncio.sleep(0.01)
+            yield line
+
+    monkeypatch.setattr(llm, "stream", stream)
+
+    async def collect():
+        return [event async for event in services.stream_itinerary("Shared Town", 2, "solo", "low", "calm")]
+
+    async def scenario():
+        return await asyncio.gather(*(collect() for _ in range(3)))
+
+    first, *others = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(events == first for events in others)
+    assert [event for event, _ in first] == ["day", "day", "done"]
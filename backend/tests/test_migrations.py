@@ -0,0 +1,30 @@
+import asyncio
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import migrations
+
+
+def test_legacy_plans_become_strict_json(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(migrations._baseline)
+                await conn.execute(
+                    text("INSERT INTO itineraries (id, destination, days, plan_json) VALUES (:id, 'x', 1, :plan)"),
+                    [
+                        {"id": 1, "plan": '[{"day": 1, "rating": NaN}]'},  # as json.dumps wrote it
+                        {"id": 2, "plan": '[{"day": 1, "rating": 4.5}]'},
+                    ]
+                )
+            assert await migrations.upgrade(engine) == [1, 2]
+            async with engine.connect() as conn:
+                rows = (await conn.execute(text("SELECT plan_json FROM itineraries ORDER BY id"))).scalars().all()
+        finally:
+            await engine.dispose()
+        return [orjson.loads(row) for row in rows]
+
+    assert asyncio.run(scenario()) == [[{"day": 1, "rating": None}], [{"day": 1, "rating": 4.5}]]
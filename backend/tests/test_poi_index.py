@@ -0,0 +1,41 @@
+import numpy as np
+
+from poi_index import POIIndex
+
+
+def _place(i: int, types: list) -> dict:
+    return {"place_id": f"p{i}", "name": f"Place {i}", "lat": 18.52 + i * 1e-4, "lng": 73.85, "types": types}
+
+
+def test_category_types_filter_after_many_other_types(tmp_path):
+    index = POIIndex(str(tmp_path / "poi_index.npz"), 0.01)
+    for i in range(100):
+        index.add(_place(i, [f"incidental_{i}", "point_of_interest"]))
+    index.add(_place(100, ["lodging"]))
+    index.add(_place(101, ["spa"]), category="hotel")
+    index.add(_place(102, ["museum", "incidental_99"]))
+
+    assert len(index._type_bits) > 64
+    assert [p["place_id"] for p in index.query(18.52, 73.85, types=["lodging"])] == ["p100", "p101"]
+    # a type past the first 64 bits filters too
+    assert [p["place_id"] for p in index.query(18.52, 73.85, types=["museum"])] == ["p102"]
+    assert {p["place_id"] for p in index.query(18.52, 73.85, types=["incidental_99"])} == {"p99", "p102"}
+
+    index.save()
+    reloaded = POIIndex(index.path, 0.01)
+    assert reloaded.load()
+    assert [p["place_id"] for p in reloaded.query(18.52, 73.85, types=["museum"])] == ["p102"]
+
+
+def test_loads_single_column_masks(tmp_path):
+    index = POIIndex(str(tmp_path / "poi_index.npz"), 0.01)
+    index.add(_place(0, ["lodging"]))
+    snapshot = index.snapshot()
+    snapshot["types"] = snapshot["types"][:, 0]  # as written before masks had columns
+    index.write(snapshot)
+
+    reloaded = POIIndex(index.path, 0.01)
+    assert reloaded.load()
+    assert reloaded.types.shape == (1, 1)
+    assert np.all(reloaded.types[:, 0] != 0)
+    assert [p["place_id"] for p in reloaded.query(18.52, 73.85, types=["lodging"])] == ["p0"]
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+import resilience
+import scheduler
+
+
+def _half_open(api: str) -> resilience.CircuitBreaker:
+    breaker = resilience._upstream(api).breaker
+    breaker._open()
+    breaker.opened_at = time.monotonic() - resilience.BREAKER_COOLDOWN_SECONDS - 1
+    return breaker
+
+
+async def _ok():
+    return "ok"
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        breaker = _half_open("test.cancelled_probe")
+        probe = asyncio.create_task(resilience.call("test.cancelled_probe", lambda: asyncio.sleep(60), hedge=False))
+        await asyncio.sleep(0)
+        assert breaker.state == resilience.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert await resilience.call("test.cancelled_probe", _ok, hedge=False) == "ok"
+        assert breaker.state == resilience.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_busy_probe_lets_the_next_call_probe():
+    async def busy():
+        raise scheduler.UpstreamBusy("quota", retry_after=1)
+
+    async def scenario():
+        breaker = _half_open("test.busy_probe")
+        with pytest.raises(scheduler.UpstreamBusy):
+            await resilience.call("test.busy_probe", busy, hedge=False)
+        assert breaker.state == resilience.HALF_OPEN
+        assert await resilience.call("test.busy_probe", _ok, hedge=False) == "ok"
+        assert breaker.state == resilience.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens():
+    async def fail():
+        raise RuntimeError("down")
+
+    async def scenario():
+        breaker = _half_open("test.failed_probe")
+        with pytest.raises(RuntimeError):
+            await resilience.call("test.failed_probe", fail, hedge=False)
+        assert breaker.state == resilience.OPEN
+        with pytest.raises(resilience.CircuitOpen):
+            await resilience.call("test.failed_probe", _ok, hedge=False)
+
+    asyncio.run(scenario())
+
+
+def _saturated(api: str) -> scheduler.UpstreamScheduler:
+    # one token per 0.2 s, and none left right now
+    limiter = scheduler._schedulers[api] = scheduler.UpstreamScheduler(api, qps=5, per_minute=300, max_queue=10)
+    for bucket in limiter.buckets:
+        bucket.drain()
+    return limiter
+
+
+def test_queue_time_is_not_upstream_latency():
+    async def fast():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        _saturated("test.queued")
+        assert await resilience.call("test.queued", lambda: scheduler.call("test.queued", fast), hedge=False) == "ok"
+        return resilience._upstream("test.queued").latency._samples[0]
+
+    assert asyncio.run(scenario()) < 0.1
+
+
+def test_no_hedge_while_waiting_for_quota():
+    async def fast():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        upstream = resilience._upstream("test.queued_hedge")
+        for _ in range(resilience.HEDGE_MIN_SAMPLES):
+            upstream.latency.record(0.01)
+        upstream.calls = 100  # leave room under HEDGE_MAX_RATIO
+        _saturated("test.queued_hedge")
+        assert await resilience.call("test.queued_hedge", lambda: scheduler.call("test.queued_hedge", fast)) == "ok"
+        return upstream.hedges
+
+    assert asyncio.run(scenario()) == 0
@@ -62,6 +62,57 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   /* ---------------- ITINERARY ---------------- */
+  function renderDay(d) {
+    let card = document.getElementById("day-" + d.day);
+    if (!card) {
+      card = document.createElement("div");
+      card.id = "day-" + d.day;
+      card.className = "card";
+      messages.appendChild(card);
+    }
+    card.textContent = `Day ${d.day}: ${d.summary}`;
+  }
+
+  function renderPlaces(d) {
+    const card = document.getElementById("day-" + d.day);
+    if (!card || !(d.places || []).length) return;
+
+    const list = document.createElement("ul");
+    d.places.forEach(p => {
+      const li = document.createElement("li");
+      li.textContent = p.rating ? `${p.name} (${p.rating}★)` : p.name;
+      list.appendChild(li);
+    });
+    card.appendChild(list);
+  }
+
+  // Reads a Server-Sent Events body and calls onEvent(name, data) per event.
+  async function readEventStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let sep;
+      while ((sep = buffer.indexOf("\n\n")) !== -1) {
+        const frame = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+
+        let name = "message";
+        let data = "";
+        frame.split("\n").forEach(line => {
+          if (line.startsWith("event:")) name = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        });
+        if (data) onEvent(name, JSON.parse(data));
+      }
+    }
+  }
+
   newItinBtn.onclick = async () => {
     if (!token) {
       alert("Please login first");
@@ -69,8 +120,9 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     showLoader();
+    messages.innerHTML = "";
     try {
-      const res = await fetch(API_BASE + "/api/itinerary", {
+      const res = await fetch(API_BASE + "/api/itinerary/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -78,18 +130,24 @@ document.addEventListener("DOMContentLoaded", () => {
         },
         body: JSON.stringify({
           destination: destInput.value || "Pune",
-          days: 3
+          days: 3,
+          travel_type: "cultural",
+          budget: "medium",
+          mood: "excited"
         })
       });
 
-      const data = await res.json();
-      messages.innerHTML = "";
+      if (!res.ok) throw new Error();
 
-      (data.plan || []).forEach(d => {
-        const div = document.createElement("div");
-        div.className = "card";
-        div.textContent = `Day ${d.day}: ${d.summary}`;
-        messages.appendChild(div);
+      await readEventStream(res, (name, data) => {
+        if (name === "day") {
+          hideLoader(); // first day is on screen, stop blocking the UI
+          renderDay(data);
+        } else if (name === "places") {
+          renderPlaces(data);
+        } else if (name === "error") {
+          throw new Error(data.detail);
+        }
       });
     } catch {
       alert("Itinerary failed");